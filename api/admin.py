@@ -1,22 +1,76 @@
+from decimal import Decimal
+
 from django.contrib import admin
-from .models import Customer, Order
+from . import search
+from .models import Customer, Order, SMSOutbox
+from .pagination import EstimatedCountPaginator
+
+
+class ScalableChangeListMixin:
+    """
+    Changelist settings for tables with millions of rows.
+
+    Searches go through the ``api.search`` index rather than a
+    ``LIKE '%term%'`` scan per ``search_fields`` entry, so ``search_fields``
+    only switches the search box on. Unfiltered pages show an estimated
+    total and filtered pages skip the second, unfiltered ``COUNT(*)``.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'code', 'email', 'phone', 'location', 'joined_at')
-    search_fields = ('name', 'code', 'email', 'phone')
+    search_fields = search.INDEXED_FIELDS['customers']
     list_filter = ('joined_at',)
     ordering = ('-joined_at',)
 
 
+class TotalCostFilter(admin.SimpleListFilter):
+    """Total cost bands, answered from the ``total_cost`` index."""
+    title = 'total cost'
+    parameter_name = 'total_cost_band'
+    bands = {
+        'under_1k': (None, Decimal('1000')),
+        '1k_10k': (Decimal('1000'), Decimal('10000')),
+        'over_10k': (Decimal('10000'), None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [('under_1k', 'Under KES 1,000'), ('1k_10k', 'KES 1,000 – 10,000'), ('over_10k', 'Over KES 10,000')]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.bands:
+            return queryset
+        low, high = self.bands[self.value()]
+        if low is not None:
+            queryset = queryset.filter(total_cost__gte=low)
+        if high is not None:
+            queryset = queryset.filter(total_cost__lt=high)
+        return queryset
+
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'customer', 'item', 'quantity', 'amount', 'total_cost', 'payment_method', 'created_at')
-    search_fields = ('customer__name', 'item', 'payment_method')
-    list_filter = ('payment_method', 'created_at')
+    # The customer column renders name and code; join only that relation
+    list_select_related = ('customer',)
+    search_fields = search.INDEXED_FIELDS['orders'] + tuple(
+        f'customer__{field}' for field in search.INDEXED_FIELDS['customers']
+    )
+    list_filter = ('payment_method', TotalCostFilter, 'created_at')
     ordering = ('-created_at',)
 
-    def total_cost(self, obj):
-        return obj.total_cost
-    total_cost.short_description = 'Total Cost'
+
+@admin.register(SMSOutbox)
+class SMSOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'phone', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('phone',)
+    ordering = ('-created_at',)
@@ -0,0 +1,237 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .authentication import JWTAuthentication, revoked_tokens, stateless_user
+from .models import Customer, Order
+from .pagination import KeysetPagination, decode_position, encode_position, keyset_page
+from .serializers import CustomerRowSerializer, CustomerSerializer, OrderRowSerializer, OrderSerializer
+from .services.outbox import enqueue_sms
+from .views import OrderViewSet
+
+_jwt = JWTAuthentication()
+
+
+async def aauthenticate(request):
+    """Validate the bearer token and load its user with the async ORM."""
+    header = _jwt.get_header(request)
+    if header is None:
+        return None
+    try:
+        raw_token = _jwt.get_raw_token(header)
+        if raw_token is None:
+            return None
+        if revoked_tokens.is_stale():
+            await sync_to_async(revoked_tokens.refresh_if_stale)()
+        validated_token = _jwt.get_validated_token(raw_token)
+        if settings.JWT_STATELESS_AUTH:
+            return stateless_user(validated_token)
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        user = await get_user_model().objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except (AuthenticationFailed, InvalidToken, KeyError, get_user_model().DoesNotExist):
+        return None
+    return user if user.is_active else None
+
+
+class AsyncAPIView(View):
+    """
+    Base for the ``/api/async/`` endpoints served natively under ASGI.
+
+    Requests authenticate with the same JWTs as the DRF API. Reads use the
+    async ORM directly. Writes run their transaction in a worker thread via
+    ``sync_to_async`` because ``transaction.atomic`` and model signals are
+    synchronous.
+    """
+    model = None
+    serializer_class = None
+    row_serializer_class = None
+    envelope = None
+    keyset_field = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated like the DRF views, so no CSRF cookie is involved
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await aauthenticate(request)
+        if request.user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        return await super().dispatch(request, *args, **kwargs)
+
+    @property
+    def plural(self):
+        return f'{self.envelope}s'
+
+    def parse_body(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def not_found(self):
+        return JsonResponse({'error': f'{self.envelope.capitalize()} not found.'}, status=404)
+
+    async def get_object(self, pk):
+        fields = self.serializer_class.Meta.fields
+        try:
+            return await self.model.objects.only(*fields).aget(pk=pk)
+        except self.model.DoesNotExist:
+            return None
+
+
+class AsyncListCreateView(AsyncAPIView):
+    def get_queryset(self, request):
+        return self.model.objects.all()
+
+    async def get(self, request):
+        try:
+            page_size = int(request.GET['page_size'])
+        except (KeyError, ValueError):
+            page_size = api_settings.PAGE_SIZE
+        page_size = max(1, min(page_size, KeysetPagination.max_page_size))
+
+        position = None
+        if request.GET.get('cursor'):
+            try:
+                position = decode_position(request.GET['cursor'])
+            except ValueError:
+                return JsonResponse({'detail': KeysetPagination.invalid_cursor_message}, status=404)
+
+        queryset = self.row_serializer_class.values(self.get_queryset(request))
+        queryset = keyset_page(queryset, self.keyset_field, position)
+        rows = [row async for row in queryset[:page_size + 1]]
+        page = rows[:page_size]
+
+        next_link = None
+        if len(rows) > page_size:
+            cursor = encode_position(page[-1][self.keyset_field], page[-1]['id'])
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', cursor)
+
+        data = self.row_serializer_class(page).data
+        return JsonResponse({self.plural: data, 'next': next_link})
+
+    async def post(self, request):
+        data = self.parse_body(request)
+        if data is None:
+            return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+
+        serializer = self.serializer_class(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse({'error': serializer.errors}, status=400)
+        await sync_to_async(self.perform_create)(serializer)
+        return JsonResponse(
+            {'message': f'{self.envelope.capitalize()} created successfully.', self.envelope: serializer.data},
+            status=201,
+        )
+
+    def perform_create(self, serializer):
+        serializer.save()
+
+
+class AsyncDetailView(AsyncAPIView):
+    async def get(self, request, pk):
+        instance = await self.get_object(pk)
+        if instance is None:
+            return self.not_found()
+        return JsonResponse({self.envelope: self.serializer_class(instance).data})
+
+    async def put(self, request, pk):
+        instance = await self.get_object(pk)
+        if instance is None:
+            return self.not_found()
+        data = self.parse_body(request)
+        if data is None:
+            return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+
+        serializer = self.serializer_class(instance, data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse({'error': serializer.errors}, status=400)
+        await sync_to_async(self.perform_update)(serializer)
+        return JsonResponse({'message': f'{self.envelope.capitalize()} updated successfully.', self.envelope: serializer.data})
+
+    async def delete(self, request, pk):
+        instance = await self.get_object(pk)
+        if instance is None:
+            return self.not_found()
+        await sync_to_async(self.perform_destroy)(instance)
+        return JsonResponse({'message': f'{self.envelope.capitalize()} deleted successfully.'}, status=204)
+
+    def perform_update(self, serializer):
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+
+
+class CustomerListCreateView(AsyncListCreateView):
+    model = Customer
+    serializer_class = CustomerSerializer
+    row_serializer_class = CustomerRowSerializer
+    envelope = 'customer'
+    keyset_field = 'joined_at'
+
+
+class CustomerDetailView(AsyncDetailView):
+    model = Customer
+    serializer_class = CustomerSerializer
+    envelope = 'customer'
+
+
+class OrderListCreateView(AsyncListCreateView):
+    model = Order
+    serializer_class = OrderSerializer
+    row_serializer_class = OrderRowSerializer
+    envelope = 'order'
+    keyset_field = 'created_at'
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.GET.get('customer_id'):
+            queryset = queryset.filter(customer_id=request.GET['customer_id'])
+        return queryset
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            order = serializer.save()
+            enqueue_sms(order.customer.phone, OrderViewSet.build_sms_message(order, "created"))
+
+
+class OrderDetailView(AsyncDetailView):
+    model = Order
+    serializer_class = OrderSerializer
+    envelope = 'order'
+
+    async def get_object(self, pk):
+        # The SMS notification needs the customer's name and phone
+        fields = self.serializer_class.Meta.fields
+        try:
+            return await Order.objects.select_related('customer').only(
+                *fields, 'customer__name', 'customer__phone'
+            ).aget(pk=pk)
+        except Order.DoesNotExist:
+            return None
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            order = serializer.save()
+            enqueue_sms(order.customer.phone, OrderViewSet.build_sms_message(order, "updated"))
+
+    def perform_destroy(self, instance):
+        phone = instance.customer.phone
+        message = OrderViewSet.build_sms_message(instance, "cancelled")
+        with transaction.atomic():
+            instance.delete()
+            enqueue_sms(phone, message)
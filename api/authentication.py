@@ -0,0 +1,125 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import RevokedAccessToken
+
+
+class RevokedTokenIndex:
+    """
+    In-process set of revoked, not yet expired access token JTIs.
+
+    Refreshed from ``RevokedAccessToken`` at most every
+    ``JWT_REVOCATION_REFRESH_SECONDS``, so checking a token costs no query in
+    between. Only access tokens are revoked there; blacklisted refresh tokens
+    never authenticate a request and stay out of the index. After the first
+    load a refresh reads only rows added since the previous one, plus those
+    created within one refresh interval of it, in case a revocation committed
+    out of id order. Tokens revoked in this process are added immediately;
+    other processes see them after their next refresh.
+    """
+
+    def __init__(self):
+        self._jtis = {}
+        self._loaded_at = None
+        self._last_id = 0
+        self._since = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        return jti in self._jtis
+
+    def is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= settings.JWT_REVOCATION_REFRESH_SECONDS
+
+    def refresh_if_stale(self):
+        if not self.is_stale():
+            return
+        # One thread reloads; the rest keep answering from the current view
+        if not self._lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self.is_stale():
+                self.reload()
+        finally:
+            self._lock.release()
+
+    def reload(self):
+        now = timezone.now()
+        rows = RevokedAccessToken.objects.filter(expires_at__gt=now).order_by()
+        if self._since is not None:
+            rows = rows.filter(Q(id__gt=self._last_id) | Q(created_at__gte=self._since))
+        jtis = {jti: expires_at for jti, expires_at in self._jtis.items() if expires_at > now}
+        for row_id, jti, expires_at in rows.values_list('id', 'jti', 'expires_at'):
+            jtis[jti] = expires_at
+            self._last_id = max(self._last_id, row_id)
+        self._jtis = jtis
+        self._since = now - timedelta(seconds=settings.JWT_REVOCATION_REFRESH_SECONDS)
+        self._loaded_at = time.monotonic()
+
+    def add(self, jti, expires_at):
+        self._jtis[jti] = expires_at
+
+    def clear(self):
+        self._jtis = {}
+        self._loaded_at = None
+        self._last_id = 0
+        self._since = None
+
+
+revoked_tokens = RevokedTokenIndex()
+
+
+def check_revoked(validated_token):
+    revoked_tokens.refresh_if_stale()
+    if validated_token.get(api_settings.JTI_CLAIM) in revoked_tokens:
+        raise InvalidToken('Token is blacklisted')
+
+
+def revoke_access_token(raw_token, user=None):
+    """Revoke an access token so it stops authenticating before it expires."""
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    RevokedAccessToken.objects.get_or_create(
+        jti=jti, defaults={'expires_at': expires_at, 'user_id': getattr(user, 'pk', None)},
+    )
+    revoked_tokens.add(jti, expires_at)
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """
+    simplejwt authentication that also rejects revoked tokens.
+
+    With ``JWT_STATELESS_AUTH`` the request user is a ``TokenUser`` built from
+    the token claims instead of a ``User`` loaded per request, so an
+    authenticated request costs no auth queries. A deactivated user's tokens
+    then keep working until they expire or are revoked.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        check_revoked(validated_token)
+        return validated_token
+
+    def get_user(self, validated_token):
+        if settings.JWT_STATELESS_AUTH:
+            return stateless_user(validated_token)
+        return super().get_user(validated_token)
+
+
+def stateless_user(validated_token):
+    if api_settings.USER_ID_CLAIM not in validated_token:
+        raise InvalidToken('Token contained no recognizable user identification')
+    return api_settings.TOKEN_USER_CLASS(validated_token)
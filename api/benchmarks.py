@@ -0,0 +1,438 @@
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tracemalloc
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.test import APIClient
+
+from api.models import Customer, Order, SMSOutbox
+from api.serializers import CustomerRowSerializer, CustomerSerializer, OrderRowSerializer, OrderSerializer
+from api.services.outbox import dispatch_pending
+from api.services.stats import rebuild_customer_stats
+
+ITEMS = ['Maize Flour', 'Cooking Oil', 'Sugar', 'Rice', 'Tea Leaves', 'Milk', 'Bread', 'Soap', 'Salt', 'Wheat Flour']
+PAYMENT_METHODS = ['M-Pesa', 'Card', 'Cash', 'Bank Transfer']
+LOCATIONS = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret']
+# Kenyan national numbers never start with the 0 trunk prefix, so no subscriber
+# holds +2540...: notifications queued for seeded customers cannot reach anyone
+# and the gateway rejects them as invalid numbers
+SEED_PHONE_PREFIX = '+2540'
+
+
+@contextmanager
+def explicit_timestamps(*model_fields):
+    """
+    Let seeded rows keep the historical timestamps they are given.
+
+    ``auto_now_add`` would otherwise stamp every row with the current time and
+    leave nothing for date filters or ordering indexes to work with.
+    """
+    fields = [model._meta.get_field(name) for model, name in model_fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def seed_dataset(customers=1000, orders=100000, batch_size=5000, days=730, seed=None, log=None):
+    """
+    Insert ``customers`` customers and ``orders`` orders spread over the last
+    ``days`` days using batched ``bulk_create``, then rebuild the customer
+    rollups. Safe to run repeatedly; new customers get codes after the
+    existing row count. Phones are in the unassigned ``SEED_PHONE_PREFIX``
+    range, so order notifications queued for them never reach a real person.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    span = days * 24 * 60 * 60
+    start = Customer.objects.count()
+
+    with explicit_timestamps((Customer, 'joined_at'), (Order, 'created_at')):
+        for offset in range(0, customers, batch_size):
+            Customer.objects.bulk_create([
+                Customer(
+                    name=f"Customer {start + i}",
+                    code=f"S{start + i:09d}",
+                    email=f"customer{start + i}@example.com",
+                    phone=f"{SEED_PHONE_PREFIX}{rng.randint(10000000, 99999999)}",
+                    location=rng.choice(LOCATIONS),
+                    joined_at=now - timedelta(seconds=rng.randint(0, span)),
+                )
+                for i in range(offset, min(offset + batch_size, customers))
+            ])
+            if log:
+                log(f"Customers: {min(offset + batch_size, customers)}/{customers}")
+
+        customer_ids = list(Customer.objects.values_list('id', flat=True))
+        for offset in range(0, orders, batch_size):
+            Order.objects.bulk_create([
+                Order(
+                    customer_id=rng.choice(customer_ids),
+                    item=rng.choice(ITEMS),
+                    quantity=rng.randint(1, 5),
+                    amount=Decimal(rng.randint(100, 500000)) / 100,
+                    payment_method=rng.choice(PAYMENT_METHODS),
+                    created_at=now - timedelta(seconds=rng.randint(0, span)),
+                )
+                for _ in range(offset, min(offset + batch_size, orders))
+            ])
+            if log:
+                log(f"Orders: {min(offset + batch_size, orders)}/{orders}")
+
+    # bulk_create bypasses the signals that maintain the per-customer rollups
+    rebuild_customer_stats()
+
+
+def order_hot_queries():
+    """The order access patterns the composite indexes are meant to serve."""
+    customer_id = Order.objects.values_list('customer_id', flat=True).order_by('id').first()
+    since = timezone.now() - timedelta(days=30)
+    return {
+        'customer_orders_newest_first': Order.objects.filter(customer_id=customer_id).order_by('-created_at')[:50],
+        'order_list_page': Order.objects.order_by('-created_at', '-id')[:100],
+        'orders_created_since': Order.objects.filter(created_at__gte=since).order_by('created_at')[:100],
+        'admin_payment_method_recent': Order.objects.filter(
+            payment_method='M-Pesa', created_at__gte=since
+        ).order_by('-created_at')[:100],
+    }
+
+
+def time_queryset(queryset, runs=5):
+    """Median wall time in milliseconds to fully evaluate ``queryset``."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        list(queryset.all())
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def _profile(queries, runs):
+    return {name: {'plan': qs.explain(), 'ms': time_queryset(qs, runs)} for name, qs in queries.items()}
+
+
+def explain_order_queries(runs=5, compare=False):
+    """
+    EXPLAIN and time the hot order queries.
+
+    With ``compare`` the ``Order`` indexes are dropped, the queries profiled
+    again and the indexes recreated, giving a before/after view in one run.
+    Only use that against a benchmark database.
+    """
+    queries = order_hot_queries()
+    report = {name: {'with_indexes': result} for name, result in _profile(queries, runs).items()}
+
+    if compare:
+        indexes = list(Order._meta.indexes)
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Order, index)
+        try:
+            for name, result in _profile(queries, runs).items():
+                report[name]['without_indexes'] = result
+        finally:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Order, index)
+    return report
+
+
+def _rows_per_second(serialize, rows, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        data = serialize()
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return data, round(rows / median) if median else None
+
+
+def serializer_throughput(rows=10000, runs=5):
+    """
+    Rows per second for a ``rows``-sized list response, fetching and
+    serializing with the ``ModelSerializer`` and with the row fast path.
+
+    Both outputs are compared so a formatting drift shows up as
+    ``identical: False`` rather than as a silently faster number.
+    """
+    report = {}
+    pairs = [
+        ('orders', Order, OrderSerializer, OrderRowSerializer),
+        ('customers', Customer, CustomerSerializer, CustomerRowSerializer),
+    ]
+    for name, model, serializer_class, row_serializer_class in pairs:
+        queryset = model.objects.order_by('-id')[:rows]
+        count = queryset.count()
+        if not count:
+            continue
+        fields = serializer_class.Meta.fields
+        slow, slow_rate = _rows_per_second(
+            lambda: serializer_class(queryset.only(*fields), many=True).data, count, runs
+        )
+        fast, fast_rate = _rows_per_second(
+            lambda: row_serializer_class(row_serializer_class.values(queryset)).data, count, runs
+        )
+        report[name] = {
+            'rows': count,
+            'model_serializer_rows_per_second': slow_rate,
+            'row_serializer_rows_per_second': fast_rate,
+            'speedup': round(fast_rate / slow_rate, 2) if slow_rate else None,
+            'identical': [dict(row) for row in slow] == fast,
+        }
+    return report
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_test(url, requests=1000, concurrency=50, token=None, timeout=30):
+    """
+    Fire ``requests`` GETs at ``url`` from ``concurrency`` client threads.
+
+    Point it at the same endpoint served by gunicorn (WSGI) and uvicorn (ASGI)
+    to compare throughput and tail latency. Latencies are in milliseconds.
+    """
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+    def fetch(_):
+        request = urllib.request.Request(url, headers=headers)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                ok = response.status < 400
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for _, ms in results]
+    return {
+        'url': url,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(1 for ok, _ in results if not ok),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 1) if elapsed else None,
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2),
+    }
+
+
+def benchmark_order_writes(orders=1000, backend='api.services.sms_backends.LocMemBackend', batch_size=None):
+    """
+    Drive the order create path in-process and then drain the SMS outbox.
+
+    Orders are POSTed through the real API stack (auth, validation, rollups,
+    cache invalidation, outbox insert). Delivery goes to ``backend`` instead of
+    ``SMS_BACKEND``, so sustained runs cost nothing at the gateway; only the
+    messages this run queued are dispatched, so other pending notifications
+    stay with the outbox worker. Only run it against a benchmark database; it
+    leaves the orders behind.
+    """
+    customer, _ = Customer.objects.get_or_create(
+        code='BENCH0001', defaults={'name': 'Benchmark Customer', 'phone': f'{SEED_PHONE_PREFIX}00000001'}
+    )
+    client = APIClient()
+    client.force_authenticate(user=get_user_model()(username='benchmark'))
+    url = reverse('order-list')
+    payload = {'customer': customer.id, 'item': 'Benchmark', 'quantity': 1, 'amount': '10.00', 'payment_method': 'Cash'}
+
+    last_outbox_id = SMSOutbox.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(orders):
+        request_started = time.perf_counter()
+        response = client.post(url, payload, format='json')
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        errors += response.status_code != 201
+    write_seconds = time.perf_counter() - started
+
+    gateway = import_string(backend)().send_bulk
+    queued = SMSOutbox.objects.filter(id__gt=last_outbox_id, phone=customer.phone)
+    sent = failed = 0
+    started = time.perf_counter()
+    while True:
+        batch_sent, batch_failed = dispatch_pending(batch_size=batch_size, gateway=gateway, queryset=queued)
+        if not batch_sent and not batch_failed:
+            break
+        sent, failed = sent + batch_sent, failed + batch_failed
+    dispatch_seconds = time.perf_counter() - started
+
+    return {
+        'orders': orders,
+        'errors': errors,
+        'orders_per_second': round(orders / write_seconds, 1) if write_seconds else None,
+        'p50_ms': round(_percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(_percentile(latencies, 95), 2) if latencies else None,
+        'backend': backend,
+        'sms_sent': sent,
+        'sms_failed': failed,
+        'sms_per_second': round(sent / dispatch_seconds, 1) if dispatch_seconds else None,
+    }
+
+
+STARTUP_COMMANDS = {
+    'manage_py_check': [sys.executable, 'manage.py', 'check'],
+    'wsgi_import': [sys.executable, '-c', 'import config.wsgi'],
+}
+
+
+def startup_times(runs=5, base_dir=None):
+    """
+    Median wall time in milliseconds of fresh interpreters running
+    ``manage.py check`` and importing the WSGI application.
+    """
+    base_dir = base_dir or os.getcwd()
+    report = {}
+    for name, command in STARTUP_COMMANDS.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(command, cwd=base_dir, check=True, capture_output=True)
+            timings.append((time.perf_counter() - started) * 1000)
+        report[name] = round(statistics.median(timings), 1)
+    return report
+
+
+def api_scenarios():
+    """
+    The request mix covered by ``benchmark_api``: ``name -> (client, method, url, payload)``,
+    where ``client`` is ``'api'`` (JWT-style forced auth) or ``'admin'`` (session login).
+    """
+    order = Order.objects.order_by('-id').first()
+    customer = order.customer
+    payload = {
+        'customer': customer.id, 'item': 'Benchmark', 'quantity': 2,
+        'amount': '25.00', 'payment_method': 'M-Pesa',
+    }
+    return {
+        'customer_list': ('api', 'get', reverse('customer-list'), None),
+        'customer_retrieve': ('api', 'get', reverse('customer-detail', args=[customer.id]), None),
+        'order_list': ('api', 'get', reverse('order-list'), None),
+        'order_list_by_customer': ('api', 'get', f"{reverse('order-list')}?customer_id={customer.id}", None),
+        'order_retrieve': ('api', 'get', reverse('order-detail', args=[order.id]), None),
+        'order_create': ('api', 'post', reverse('order-list'), payload),
+        'order_update': ('api', 'put', reverse('order-detail', args=[order.id]), payload),
+        'customer_search': ('api', 'get', f"{reverse('customer-search')}?q={customer.code}", None),
+        'order_search': ('api', 'get', f"{reverse('order-search')}?q={customer.code}", None),
+        'order_analytics': ('api', 'get', f"{reverse('order-analytics')}?period=day&group_by=location", None),
+        'admin_customer_changelist': ('admin', 'get', reverse('admin:api_customer_changelist'), None),
+        'admin_order_changelist': ('admin', 'get', reverse('admin:api_order_changelist'), None),
+    }
+
+
+def _benchmark_clients():
+    user, created = get_user_model().objects.get_or_create(
+        username='benchmark', defaults={'is_staff': True, 'is_superuser': True}
+    )
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=['password'])
+    api = APIClient()
+    api.force_authenticate(user=user)
+    admin = Client()
+    admin.force_login(user)
+    return {'api': api, 'admin': admin}
+
+
+def benchmark_api(requests=50, warmup=3, scenarios=None):
+    """
+    Run every API scenario ``requests`` times in-process and report latency
+    percentiles, queries per request and peak Python memory per request.
+
+    Memory is traced in one extra request per scenario so tracemalloc's
+    overhead does not distort the timings. Writes leave rows behind, so run
+    it against a seeded benchmark database.
+    """
+    clients = _benchmark_clients()
+    results = {}
+    for name, (client_name, method, url, payload) in api_scenarios().items():
+        if scenarios and name not in scenarios:
+            continue
+        call = getattr(clients[client_name], method)
+        kwargs = {'data': payload, 'format': 'json'} if client_name == 'api' and payload else {}
+
+        for _ in range(warmup):
+            call(url, **kwargs)
+
+        latencies, queries, statuses = [], [], set()
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = call(url, **kwargs)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            statuses.add(response.status_code)
+
+        tracemalloc.start()
+        call(url, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            'status': sorted(statuses),
+            'p50_ms': round(_percentile(latencies, 50), 3),
+            'p95_ms': round(_percentile(latencies, 95), 3),
+            'p99_ms': round(_percentile(latencies, 99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    return {
+        'meta': {
+            'database': connection.vendor,
+            'customers': Customer.objects.count(),
+            'orders': Order.objects.count(),
+            'requests': requests,
+            'generated_at': timezone.now().isoformat(),
+        },
+        'scenarios': results,
+    }
+
+
+def compare_reports(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """
+    List scenarios that regressed against ``baseline``: p95 latency up by more
+    than ``threshold`` (a fraction) and at least ``min_delta_ms``, so jitter on
+    sub-millisecond cached paths is not flagged, or more queries per request.
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        if result['p95_ms'] - before['p95_ms'] > max(before['p95_ms'] * threshold, min_delta_ms):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
@@ -0,0 +1,52 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def detail_key(kind, pk):
+    # API_CACHE_VERSION is bumped whenever a serializer's output changes
+    return f'api:{kind}:{pk}:v{settings.API_CACHE_VERSION}'
+
+
+def get_cached_detail(kind, pk):
+    return cache.get(detail_key(kind, pk))
+
+
+def cache_detail(kind, pk, data):
+    """Store a serialized payload with its ETag and return the cache entry."""
+    body = json.dumps(data, sort_keys=True, default=str).encode()
+    entry = {'etag': f'"{hashlib.md5(body).hexdigest()}"', 'data': data}
+    cache.set(detail_key(kind, pk), entry, settings.API_CACHE_TIMEOUT)
+    return entry
+
+
+def invalidate_details(kind, pks):
+    """
+    Drop cached payloads now and again once the surrounding transaction
+    commits, so a read racing the write cannot re-cache the old row.
+    """
+    keys = [detail_key(kind, pk) for pk in pks]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in candidates or '*' in candidates
+
+
+def detail_response(request, envelope_key, entry):
+    if etag_matches(request, entry['etag']):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response({envelope_key: entry['data']}, status=status.HTTP_200_OK)
+    response['ETag'] = entry['etag']
+    return response
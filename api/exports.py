@@ -0,0 +1,66 @@
+import csv
+import json
+
+from api.serializers import OrderRowSerializer
+
+ORDER_EXPORT_FIELDS = [name for name, _, _ in OrderRowSerializer.columns]
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Echo:
+    """File-like object whose write() just hands back the line for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def order_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield orders as plain dicts matching the ``OrderSerializer`` output.
+
+    Rows are read in ``chunk_size`` pages keyed on ``id``, each its own
+    indexed range query, so memory stays flat regardless of how many orders
+    match on every database backend. ``iterator()`` only streams through a
+    server-side cursor on PostgreSQL and Oracle; MySQL would buffer the
+    whole result set.
+    """
+    rows = OrderRowSerializer.values(queryset.order_by('id'))
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+        for row in chunk:
+            yield OrderRowSerializer.to_representation(row)
+        if len(chunk) < chunk_size:
+            break
+        last_id = chunk[-1]['id']
+
+
+def _batched(lines, size=500):
+    # Join lines into larger chunks so the server is not flushing one tiny write per row
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_ndjson(rows):
+    return _batched(json.dumps(row) + '\n' for row in rows)
+
+
+def stream_csv(rows, fields=ORDER_EXPORT_FIELDS):
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([row[field] for field in fields])
+
+    return _batched(lines())
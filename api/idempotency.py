@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.models import IdempotencyKey
+from api.services.maintenance import delete_in_batches
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _digest(*parts):
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+
+def _error(message, code):
+    return Response({'error': message}, status=code)
+
+
+def _claim(key_hash, request_hash):
+    """
+    Return ``(record, error_response)`` for a keyed request.
+
+    A record with no ``status_code`` is held by this request, which must go
+    on to process it; one with a ``status_code`` is a finished response to
+    replay. Concurrent duplicates race on the unique ``key_hash``: the loser
+    gets the winner's row back and answers 409 until it finishes.
+    """
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+    if record is not None and record.expires_at <= now:
+        IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+        record = None
+    if record is None:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    key_hash=key_hash, request_hash=request_hash, locked_at=now,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                ), None
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+            if record is None:
+                return None, _error('A request with this Idempotency-Key is in progress.', status.HTTP_409_CONFLICT)
+
+    if record.request_hash != request_hash:
+        return None, _error('Idempotency-Key was already used for a different request.',
+                            status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if record.status_code is not None:
+        return record, None
+    # Held by another request; take it over only if that one looks abandoned
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    if record.locked_at <= stale and IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, locked_at=record.locked_at,
+    ).update(locked_at=now):
+        return record, None
+    return None, _error('A request with this Idempotency-Key is in progress.', status.HTTP_409_CONFLICT)
+
+
+def _replay(record):
+    response = Response(json.loads(record.response_body), status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """
+    Make a DRF view method safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key runs the view, and its response is stored in
+    the same transaction as the view's writes. Retries within
+    ``IDEMPOTENCY_KEY_TTL`` get that response back without validating,
+    writing or notifying again. Keys are scoped to ``scope`` and the user.
+    Server errors release the key so the client can retry for real.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return view_method(self, request, *args, **kwargs)
+            if not key.strip() or len(key) > MAX_KEY_LENGTH:
+                return _error(f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters.', status.HTTP_400_BAD_REQUEST)
+
+            key_hash = _digest(scope, str(request.user.pk or ''), key)
+            body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+            record, error = _claim(key_hash, _digest(request.method, request.path, body))
+            if error is not None:
+                return error
+            if record.status_code is not None:
+                return _replay(record)
+
+            try:
+                with transaction.atomic():
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        IdempotencyKey.objects.filter(pk=record.pk).update(
+                            status_code=response.status_code,
+                            response_body=json.dumps(response.data, cls=JSONEncoder),
+                        )
+            except Exception:
+                IdempotencyKey.objects.filter(pk=record.pk).delete()
+                raise
+            if response.status_code >= 500:
+                IdempotencyKey.objects.filter(pk=record.pk).delete()
+            return response
+        return wrapper
+    return decorator
+
+
+def prune_expired_keys(batch_size=5000, pause=0, log=None):
+    """Delete expired idempotency keys ``batch_size`` at a time; returns how many were deleted."""
+    return delete_in_batches(
+        IdempotencyKey.objects.filter(expires_at__lte=timezone.now()), batch_size, pause, log,
+        label='expired idempotency keys',
+    )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class PruneCommand(BaseCommand):
+    """
+    Base for commands that delete expired rows in batches through a
+    ``prune(batch_size, pause, log)`` function; schedule them, e.g. hourly from cron.
+    """
+    prune = None
+    noun = 'rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows deleted per batch.")
+        parser.add_argument('--pause', type=float, default=0, help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+        deleted = self.prune(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} expired {self.noun}."))
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import benchmark_order_writes
+
+
+class Command(BaseCommand):
+    help = "Measure order create and SMS outbox throughput with a zero-cost SMS backend. Benchmark databases only."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help="Orders to create.")
+        parser.add_argument('--backend', default='api.services.sms_backends.LocMemBackend',
+                            help="SMS backend used to drain the outbox (dotted path).")
+        parser.add_argument('--batch-size', type=int, default=None, help="Outbox messages claimed per batch.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        if options['orders'] < 1:
+            raise CommandError("--orders must be positive.")
+        if options['backend'].endswith('AfricasTalkingBackend'):
+            raise CommandError("Refusing to benchmark against the real SMS gateway; pick a local backend.")
+
+        report = benchmark_order_writes(
+            orders=options['orders'], backend=options['backend'], batch_size=options['batch_size']
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Orders: {report['orders_per_second']} orders/s ({report['errors']} errors), "
+            f"p50 {report['p50_ms']} ms, p95 {report['p95_ms']} ms"
+        )
+        self.stdout.write(
+            f"SMS via {report['backend']}: {report['sms_sent']} sent, {report['sms_failed']} failed, "
+            f"{report['sms_per_second']} msgs/s"
+        )
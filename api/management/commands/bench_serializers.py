@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import serializer_throughput
+
+
+class Command(BaseCommand):
+    help = "Compare ModelSerializer and row fast-path throughput for list responses (seed data first with seed_data)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per simulated response.")
+        parser.add_argument('--runs', type=int, default=5, help="Timed runs per serializer; the median is reported.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        report = serializer_throughput(rows=options['rows'], runs=options['runs'])
+        if not report:
+            self.stdout.write(self.style.WARNING("No rows to serialize; run seed_data first."))
+            return
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for name, result in report.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({result['rows']} rows)"))
+            self.stdout.write(f"  ModelSerializer: {result['model_serializer_rows_per_second']} rows/s")
+            self.stdout.write(f"  Row serializer:  {result['row_serializer_rows_per_second']} rows/s")
+            self.stdout.write(f"  Speedup: {result['speedup']}x, identical output: {result['identical']}")
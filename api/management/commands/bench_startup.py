@@ -0,0 +1,22 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import startup_times
+
+
+class Command(BaseCommand):
+    help = "Time `manage.py check` and the WSGI application import in fresh interpreters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Runs per measurement; the median is reported.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        report = startup_times(runs=options['runs'], base_dir=settings.BASE_DIR)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, ms in report.items():
+            self.stdout.write(f"{name}: {ms} ms")
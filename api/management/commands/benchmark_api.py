@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import benchmark_api, compare_reports, seed_dataset
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API and admin request paths in-process and write a JSON report. "
+        "Writes rows, so use a benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=0, help="Seed this many customers first.")
+        parser.add_argument('--orders', type=int, default=0, help="Seed this many orders first.")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for the seeded dataset.")
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per scenario.")
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help="Only run this scenario (repeatable).")
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--baseline', help="Earlier JSON report to compare against.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed p95 slowdown against the baseline, as a fraction.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        if options['customers'] or options['orders']:
+            seed_dataset(customers=max(options['customers'], 1), orders=options['orders'], seed=options['seed'])
+        if not Order.objects.exists():
+            raise CommandError("No orders to benchmark; pass --customers/--orders or run seed_data first.")
+
+        report = benchmark_api(
+            requests=options['requests'], warmup=options['warmup'], scenarios=options['scenarios']
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            meta = report['meta']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{meta['database']}: {meta['customers']} customers, {meta['orders']} orders, "
+                f"{meta['requests']} requests per scenario"
+            ))
+            for name, result in report['scenarios'].items():
+                self.stdout.write(
+                    f"  {name:<28} p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+                    f"p99 {result['p99_ms']:>8} ms  {result['queries']:>3} queries  "
+                    f"{result['peak_memory_kb']:>8} KiB  status {result['status']}"
+                )
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as handle:
+                regressions = compare_reports(json.load(handle), report, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(f"Regression: {regression}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
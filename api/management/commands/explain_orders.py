@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import explain_order_queries
+
+
+class Command(BaseCommand):
+    help = "Show query plans and timings for the hot order queries (seed data first with seed_data)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Timed runs per query; the median is reported.")
+        parser.add_argument('--compare', action='store_true',
+                            help="Also profile with the order indexes temporarily dropped. Benchmark databases only.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        report = explain_order_queries(runs=options['runs'], compare=options['compare'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for name, variants in report.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for variant, result in variants.items():
+                self.stdout.write(f"  {variant}: {result['ms']} ms")
+                for line in result['plan'].splitlines():
+                    self.stdout.write(f"    {line}")
@@ -0,0 +1,40 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.customer_import import REQUIRED_COLUMNS, import_customers
+from api.services.phone import cache_stats
+
+
+class Command(BaseCommand):
+    help = "Bulk import or update customers from a CSV file with name, code, phone, email and location columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the CSV file.")
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help="Rows upserted per batch (defaults to CUSTOMER_IMPORT_CHUNK_SIZE).")
+        parser.add_argument('--encoding', default='utf-8-sig')
+
+    def handle(self, *args, **options):
+        try:
+            handle = open(options['path'], newline='', encoding=options['encoding'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with handle:
+            reader = csv.DictReader(handle)
+            missing = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(f"Missing required columns: {', '.join(sorted(missing))}")
+            result = import_customers(reader, chunk_size=options['chunk_size'])
+
+        for reject in result.rejected:
+            self.stderr.write(f"Line {reject['line']} ({reject['code'] or 'no code'}): {reject['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} customers, rejected {len(result.rejected)} "
+            f"in {result.elapsed:.2f}s ({result.rows_per_second} rows/s)"
+        ))
+
+        stats = cache_stats()
+        if stats['hit_rate'] is not None:
+            self.stdout.write(f"Phone cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import load_test
+
+
+class Command(BaseCommand):
+    help = "Measure throughput and latency of a running API endpoint, e.g. to compare WSGI and ASGI servers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='+', help="Endpoint URL(s) to load; each is reported separately.")
+        parser.add_argument('--requests', type=int, default=1000, help="Total requests per URL.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Concurrent client threads.")
+        parser.add_argument('--token', help="JWT access token sent as a Bearer header.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        reports = [
+            load_test(url, requests=options['requests'], concurrency=options['concurrency'], token=options['token'])
+            for url in options['url']
+        ]
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        for report in reports:
+            self.stdout.write(self.style.MIGRATE_HEADING(report['url']))
+            self.stdout.write(
+                f"  {report['requests_per_second']} req/s over {report['seconds']}s, "
+                f"{report['errors']} errors, p50 {report['p50_ms']} ms, "
+                f"p95 {report['p95_ms']} ms, p99 {report['p99_ms']} ms"
+            )
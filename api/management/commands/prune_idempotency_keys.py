@@ -0,0 +1,8 @@
+from api.idempotency import prune_expired_keys
+from api.management.base import PruneCommand
+
+
+class Command(PruneCommand):
+    help = "Delete expired Idempotency-Key records in batches."
+    prune = staticmethod(prune_expired_keys)
+    noun = 'idempotency keys'
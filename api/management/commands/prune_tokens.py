@@ -0,0 +1,8 @@
+from api.management.base import PruneCommand
+from api.services.tokens import prune_expired_tokens
+
+
+class Command(PruneCommand):
+    help = "Delete expired outstanding, blacklisted and revoked JWTs in batches."
+    prune = staticmethod(prune_expired_tokens)
+    noun = 'tokens'
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services.stats import rebuild_customer_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-customer order rollups from the orders table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer', type=int, action='append', dest='customers',
+                            help="Only rebuild this customer id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuilt = rebuild_customer_stats(options['customers'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {rebuilt} customers in {time.monotonic() - started:.2f}s"
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the customer/order search index if missing and refill it. Run it after a migration "
+        "that rebuilds the customers or orders table on SQLite, which drops the index triggers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database alias to index.")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        started = time.monotonic()
+        search.install(connection)
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index ready on {connection.vendor} in {time.monotonic() - started:.2f}s"
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Seed customers and orders for benchmarking. Do not run against production."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=730, help="Spread timestamps over this many past days.")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for a reproducible dataset.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        seed_dataset(
+            customers=options['customers'],
+            orders=options['orders'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+            seed=options['seed'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['customers']} customers and {options['orders']} orders "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
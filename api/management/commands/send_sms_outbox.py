@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.services.outbox import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued SMS notifications from the outbox, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SMS_OUTBOX_BATCH_SIZE,
+                            help="Maximum number of messages claimed per batch.")
+        parser.add_argument('--interval', type=float, default=settings.SMS_OUTBOX_POLL_INTERVAL,
+                            help="Seconds to sleep when the outbox has nothing due.")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain everything currently due, then exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        try:
+            while True:
+                sent, failed = dispatch_pending(batch_size=batch_size)
+                if sent or failed:
+                    self.stdout.write(f"Outbox batch: {sent} sent, {failed} failed")
+                if sent + failed < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Outbox worker stopped.")
@@ -0,0 +1,185 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Timings of the request being handled, set by PerformanceMiddleware when the
+# request is sampled. Context variables follow sync_to_async into worker threads.
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Seconds and call counts per segment (``db``, ``serializer``, ``sms``) for one request."""
+
+    def __init__(self):
+        self.segments = {}
+
+    def add(self, name, seconds):
+        total, count = self.segments.get(name, (0.0, 0))
+        self.segments[name] = (total + seconds, count + 1)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's wall time to segment ``name`` of the current sampled request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection (see ApiConfig.ready); a no-op unless sampled
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = _labels(self.labels, label_values)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{{labels}}} {total}')
+                lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUESTS = Counter('api_requests_total', 'Sampled requests by view, method and status.', ('view', 'method', 'status'))
+REQUEST_DURATION = Histogram('api_request_duration_seconds', 'Wall time per sampled request.', ('view', 'method'))
+DB_DURATION = Histogram('api_db_duration_seconds', 'Database time per sampled request.', ('view', 'method'))
+DB_QUERIES = Histogram('api_db_queries', 'Database queries per sampled request.', ('view', 'method'),
+                       buckets=QUERY_COUNT_BUCKETS)
+SERIALIZER_DURATION = Histogram('api_serializer_duration_seconds', 'Serializer time per sampled request.',
+                                ('view', 'method'))
+SMS_DURATION = Histogram('api_sms_duration_seconds', 'SMS send time per sampled request.', ('view', 'method'))
+
+REGISTRY = [REQUESTS, REQUEST_DURATION, DB_DURATION, DB_QUERIES, SERIALIZER_DURATION, SMS_DURATION]
+
+
+def observe_request(view, method, status, seconds, timings):
+    REQUESTS.inc(view, method, status)
+    REQUEST_DURATION.observe(seconds, view, method)
+    db_seconds, db_queries = timings.segments.get('db', (0.0, 0))
+    DB_DURATION.observe(db_seconds, view, method)
+    DB_QUERIES.observe(db_queries, view, method)
+    if 'serializer' in timings.segments:
+        SERIALIZER_DURATION.observe(timings.segments['serializer'][0], view, method)
+    if 'sms' in timings.segments:
+        SMS_DURATION.observe(timings.segments['sms'][0], view, method)
+
+
+def server_timing(seconds, timings):
+    """``Server-Timing`` header value for one request, durations in milliseconds."""
+    parts = [f'app;dur={seconds * 1000:.2f}']
+    for name, (total, count) in timings.segments.items():
+        description = f';desc="{count} queries"' if name == 'db' else ''
+        parts.append(f'{name};dur={total * 1000:.2f}{description}')
+    return ', '.join(parts)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    from api.services.phone import cache_stats
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+
+    phone = cache_stats()
+    lines += [
+        '# HELP api_phone_cache_hits_total Phone normalization cache hits.',
+        '# TYPE api_phone_cache_hits_total counter',
+        f"api_phone_cache_hits_total {phone['hits']}",
+        '# HELP api_phone_cache_misses_total Phone normalization cache misses.',
+        '# TYPE api_phone_cache_misses_total counter',
+        f"api_phone_cache_misses_total {phone['misses']}",
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,69 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from api import metrics
+
+
+class PerformanceMiddleware:
+    """
+    Records wall, database, serializer and SMS time for a sample of requests.
+
+    Sampled requests get a ``Server-Timing`` header and feed the histograms
+    served at ``/metrics``. ``PERF_SAMPLE_RATE`` is the fraction of requests
+    sampled; at 0 the middleware only adds one settings lookup per request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        timings, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.finish(request, response, time.perf_counter() - started, timings)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        timings, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.finish(request, response, time.perf_counter() - started, timings)
+        return response
+
+    @staticmethod
+    def sampled():
+        rate = settings.PERF_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def finish(request, response, seconds, timings):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.observe_request(view, request.method, response.status_code, seconds, timings)
+
+        header = metrics.server_timing(seconds, timings)
+        if response.has_header('Server-Timing'):
+            header = f"{response['Server-Timing']}, {header}"
+        response['Server-Timing'] = header
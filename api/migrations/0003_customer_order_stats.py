@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-17 12:39
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_stats(apps, schema_editor):
+    Order = apps.get_model('api', 'Order')
+    CustomerOrderStats = apps.get_model('api', 'CustomerOrderStats')
+    rows = Order.objects.order_by().values('customer_id').annotate(
+        order_count=models.Count('id'),
+        total_spent=models.Sum(
+            models.F('quantity') * models.F('amount'),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        ),
+        last_order_at=models.Max('created_at'),
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(CustomerOrderStats(**row))
+        if len(batch) >= 1000:
+            CustomerOrderStats.objects.bulk_create(batch)
+            batch = []
+    CustomerOrderStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_order_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerOrderStats',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_stats', serialize=False, to='api.customer')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'customer_order_stats',
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-17 13:05
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_customer_order_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('amount')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_cost', 'id'], name='orders_total_cost_id_idx'),
+        ),
+    ]
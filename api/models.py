@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
+from api.services.phone import InvalidPhoneNumber, normalize_phone
 
 class Customer(models.Model):
     name = models.CharField(max_length=100)
@@ -12,10 +16,29 @@ class Customer(models.Model):
 
     class Meta:
         db_table = 'customers'
+        indexes = [
+            # Keyset pagination of the customer list
+            models.Index(fields=['joined_at', 'id'], name='customers_joined_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so saves can tell whether the location changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return f"{self.name} ({self.code})"
 
+    def clean(self):
+        # Admin edits store the same canonical E.164 phone as the API and CSV import
+        if self.phone:
+            try:
+                self.phone = normalize_phone(self.phone)
+            except InvalidPhoneNumber as e:
+                raise ValidationError({'phone': str(e)})
+
 
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -28,14 +51,125 @@ class Order(models.Model):
     )
     payment_method = models.CharField(max_length=50, default="M-Pesa")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Computed and stored by the database, so every write path (bulk_create,
+    # QuerySet.update, raw SQL) keeps it in step with quantity and amount
+    total_cost = models.GeneratedField(
+        expression=models.F('quantity') * models.F('amount'),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'orders'
-        
-    @property
-    def total_cost(self):
-        return self.quantity * self.amount
+        indexes = [
+            # "Orders for customer X, newest first"
+            models.Index(fields=['customer', '-created_at'], name='orders_customer_created_idx'),
+            # Date-range filters and keyset pagination of the order list
+            models.Index(fields=['created_at', 'id'], name='orders_created_id_idx'),
+            # Admin changelist filtering by payment method within a date range
+            models.Index(fields=['payment_method', 'created_at'], name='orders_payment_created_idx'),
+            # "Top orders" keyset pagination and total cost range filters
+            models.Index(fields=['total_cost', 'id'], name='orders_total_cost_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so the stats rollup can apply deltas on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The database recomputed total_cost, but only inserts can read it back
+        # (via RETURNING). Mirror it rather than spend a query re-reading it, or
+        # defer it when the inputs were not loaded.
+        if 'quantity' in self.__dict__ and 'amount' in self.__dict__:
+            amount = self._meta.get_field('amount').to_python(self.amount)
+            self.total_cost = (int(self.quantity) * amount).quantize(Decimal('0.01'))
+        else:
+            self.__dict__.pop('total_cost', None)
 
     def __str__(self):
         return f"Order #{self.id} - {self.item} x{self.quantity}"
-    
+
+
+class CustomerOrderStats(models.Model):
+    """Per-customer order totals, maintained incrementally on every order write."""
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='order_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    last_order_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'customer_order_stats'
+
+    def __str__(self):
+        return f"Stats for customer #{self.customer_id}: {self.order_count} orders"
+
+
+class SMSOutbox(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    phone = models.CharField(max_length=20)
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'sms_outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='sms_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"SMS #{self.id} to {self.phone} ({self.status})"
+
+
+class RevokedAccessToken(models.Model):
+    """An access token revoked before it expires, e.g. by logging out."""
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.SET_NULL)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'revoked_access_tokens'
+        indexes = [
+            models.Index(fields=['expires_at'], name='revoked_access_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Revoked access token {self.jti}"
+
+
+class IdempotencyKey(models.Model):
+    """A client's ``Idempotency-Key`` and the response its first request produced."""
+    # sha256 of (scope, user, key): fixed-size whatever the client sends
+    key_hash = models.CharField(max_length=64, unique=True)
+    request_hash = models.CharField(max_length=64)
+    # Null while the first request is still being processed
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.TextField(blank=True, default='')
+    locked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key_hash[:12]} ({self.status_code or 'in flight'})"
@@ -0,0 +1,161 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def parse_decimal(value):
+    value = Decimal(value)
+    return value if value.is_finite() else None
+
+
+def position_parser(model, name):
+    """The ``decode_position`` parser for keyset field ``name`` of ``model``."""
+    field = model._meta.get_field(name)
+    if isinstance(getattr(field, 'output_field', field), models.DecimalField):
+        return parse_decimal
+    return parse_datetime
+
+
+def encode_position(value, pk):
+    # Datetimes as ISO 8601, decimals in their exact string form
+    position = [value.isoformat() if hasattr(value, 'isoformat') else str(value), pk]
+    return base64.urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+
+def decode_position(encoded, parse=parse_datetime):
+    """Return ``(value, id)`` from an opaque cursor, or raise ``ValueError``."""
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        value = parse(value)
+        pk = int(pk)
+    except (TypeError, ValueError, ArithmeticError, UnicodeEncodeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    if value is None:
+        raise ValueError('Invalid cursor')
+    return value, pk
+
+
+def keyset_page(queryset, field, position=None):
+    """Order newest first on ``(field, id)`` and start after ``position`` if given."""
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+    return queryset.order_by(f'-{field}', '-id')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first keyset pagination on ``(<view.keyset_field>, id)``.
+
+    Each page is a single indexed range scan from the position encoded in the
+    opaque ``cursor`` parameter, so the cost does not grow with page depth the
+    way ``OFFSET`` does.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field = view.keyset_field
+        page_size = self.get_page_size(request)
+
+        self.parse = position_parser(queryset.model, self.field)
+        queryset = keyset_page(queryset, self.field, self.decode_cursor(request))
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return decode_position(encoded, self.parse)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        # Fast-path list views page over values() dicts rather than model instances
+        if isinstance(instance, dict):
+            encoded = encode_position(instance[self.field], instance['id'])
+        else:
+            encoded = encode_position(getattr(instance, self.field), instance.id)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+
+def estimated_count(model, using):
+    """
+    Row count of ``model``'s table from database statistics, or ``None``.
+
+    PostgreSQL and MySQL report the planner's estimate. SQLite keeps none, so
+    the id span stands in as a cheap upper bound.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(id) - MIN(id) + 1 FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that was never analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that skips ``COUNT(*)`` on large, unfiltered changelists.
+
+    An exact count of millions of rows scans a whole index on PostgreSQL and
+    InnoDB. For an unfiltered queryset whose estimated size is at least
+    ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` the estimate is used instead; filtered
+    or smaller querysets are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
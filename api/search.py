@@ -0,0 +1,231 @@
+import operator
+import re
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from api.models import Customer, Order
+from api.services.phone import international_digits
+
+# Columns covered by each table's search index
+INDEXED_FIELDS = {
+    'customers': ('name', 'code', 'phone', 'email', 'location'),
+    'orders': ('item', 'payment_method'),
+}
+# Columns that also get a trigram index on PostgreSQL, for infix matches
+TRIGRAM_FIELDS = {
+    'customers': ('name', 'phone'),
+    'orders': ('item',),
+}
+
+TOKEN_PATTERN = re.compile(r'\w+')
+# Something typed as a phone number: "+254 722 000", "0722-000-111"
+PHONE_TERM_PATTERN = re.compile(r'^\+?[\d\s().-]*\d{3}[\d\s().-]*$')
+
+
+def tokens(term):
+    """
+    Words of a search term, each a tuple of alternatives; every word must
+    prefix-match some indexed column with one of its alternatives.
+
+    A phone-like term becomes one word: its digits as typed and as stored in
+    E.164, so ``0722 000`` finds ``+254722000111``.
+    """
+    term = (term or '').strip()
+    if PHONE_TERM_PATTERN.match(term):
+        digits = re.sub(r'\D', '', term)
+        return [tuple(dict.fromkeys([digits, international_digits(term)]))]
+    return [(word,) for word in TOKEN_PATTERN.findall(term)]
+
+
+def _fts_query(words, vendor):
+    if vendor == 'sqlite':
+        return ' AND '.join('(' + ' OR '.join(f'"{option}"*' for option in word) + ')' for word in words)
+    if vendor == 'postgresql':
+        return ' & '.join('(' + ' | '.join(f'{option}:*' for option in word) + ')' for word in words)
+    if vendor == 'mysql':
+        return ' '.join('+(' + ' '.join(f'{option}*' for option in word) + ')' for word in words)
+    return None
+
+
+def _document(table):
+    # The exact expression the PostgreSQL GIN index is built on
+    columns = " || ' ' || ".join(f"coalesce({field}, '')" for field in INDEXED_FIELDS[table])
+    return f"to_tsvector('simple', {columns})"
+
+
+def _sqlite_statements(table):
+    fields = INDEXED_FIELDS[table]
+    columns = ', '.join(fields)
+    new = ', '.join(f'new.{field}' for field in fields)
+    old = ', '.join(f'old.{field}' for field in fields)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({columns}, content='{table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        # Only edits to indexed columns touch the index, not e.g. quantity changes
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+        f"INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new}); END",
+    ]
+
+
+def _postgresql_statements(table):
+    statements = [f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN ({_document(table)})"]
+    statements += [
+        f"CREATE INDEX IF NOT EXISTS {table}_{field}_trgm_idx ON {table} USING GIN ({field} gin_trgm_ops)"
+        for field in TRIGRAM_FIELDS[table]
+    ]
+    return statements
+
+
+def install(connection):
+    """
+    Create the search index for ``connection``'s database and fill it.
+
+    SQLite gets FTS5 tables kept current by triggers, PostgreSQL tsvector and
+    trigram GIN indexes, MySQL FULLTEXT indexes. Other databases fall back to
+    prefix matching. Safe to run again, e.g. after a migration rebuilt a table
+    on SQLite, which drops its triggers.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for table in INDEXED_FIELDS:
+                for statement in _sqlite_statements(table):
+                    cursor.execute(statement)
+                cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table in INDEXED_FIELDS:
+                for statement in _postgresql_statements(table):
+                    cursor.execute(statement)
+        elif connection.vendor == 'mysql':
+            for table, fields in INDEXED_FIELDS.items():
+                cursor.execute(
+                    'SELECT 1 FROM information_schema.statistics '
+                    'WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s',
+                    [table, f'{table}_search_idx'],
+                )
+                if cursor.fetchone() is None:
+                    cursor.execute(f"ALTER TABLE {table} ADD FULLTEXT INDEX {table}_search_idx ({', '.join(fields)})")
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        for table in INDEXED_FIELDS:
+            if connection.vendor == 'sqlite':
+                for action in ('insert', 'delete', 'update'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{action}')
+                cursor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+                for field in TRIGRAM_FIELDS[table]:
+                    cursor.execute(f'DROP INDEX IF EXISTS {table}_{field}_trgm_idx')
+            elif connection.vendor == 'mysql':
+                cursor.execute(f'ALTER TABLE {table} DROP INDEX {table}_search_idx')
+
+
+def scored_sql(table, term, vendor):
+    """
+    ``(sql, params)`` selecting ``id, score`` of the ``table`` rows matching
+    every word of ``term`` through the search index, higher scores ranking
+    first, or ``None`` when ``vendor`` has no index.
+    """
+    query = _fts_query(tokens(term), vendor)
+    if vendor == 'sqlite':
+        # bm25() is lower for better matches
+        return f'SELECT rowid AS id, -bm25({table}_fts) AS score FROM {table}_fts WHERE {table}_fts MATCH %s', [query]
+    if vendor == 'postgresql':
+        document = _document(table)
+        infix = ' OR '.join(f'{field} ILIKE %s' for field in TRIGRAM_FIELDS[table])
+        pattern = f"%{term.strip().replace('%', '').replace('_', '')}%"
+        return (
+            f"SELECT id, ts_rank({document}, to_tsquery('simple', %s)) AS score FROM {table} "
+            f"WHERE {document} @@ to_tsquery('simple', %s) OR {infix}",
+            [query, query] + [pattern] * len(TRIGRAM_FIELDS[table]),
+        )
+    if vendor == 'mysql':
+        match = f"MATCH({', '.join(INDEXED_FIELDS[table])}) AGAINST (%s IN BOOLEAN MODE)"
+        return f'SELECT id, {match} AS score FROM {table} WHERE {match}', [query, query]
+    return None
+
+
+def match_sql(table, term, vendor):
+    """Like ``scored_sql`` but selecting only ``id``, for ``IN`` filters."""
+    if vendor == 'sqlite':
+        return f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s', [_fts_query(tokens(term), vendor)]
+    scored = scored_sql(table, term, vendor)
+    if scored is None:
+        return None
+    sql, params = scored
+    return f'SELECT id FROM ({sql}) AS matches', params
+
+
+def _prefix_filter(fields, words):
+    return reduce(operator.and_, [
+        reduce(operator.or_, [Q(**{f'{field}__istartswith': option}) for field in fields for option in word])
+        for word in words
+    ])
+
+
+def _matches(model, term, vendor, prefix=''):
+    table = model._meta.db_table
+    sql = match_sql(table, term, vendor)
+    if sql is None:
+        return _prefix_filter([prefix + field for field in INDEXED_FIELDS[table]], tokens(term))
+    return Q(**{f'{prefix}pk__in': RawSQL(*sql)})
+
+
+def filter_queryset(queryset, term):
+    """
+    Restrict a customer or order queryset to rows matching ``term``.
+
+    Orders also match on their customer's indexed columns. Every row matches
+    at most once, so no ``distinct()`` is needed.
+    """
+    if not tokens(term):
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    model = queryset.model
+    condition = _matches(model, term, vendor)
+    if model is Order:
+        condition |= _matches(Customer, term, vendor, prefix='customer__')
+    return queryset.filter(condition)
+
+
+def ranked_ids(model, term, limit, offset=0, using='default'):
+    """
+    Ids of the customers or orders matching ``term``, best match first.
+
+    Orders rank by their own columns or their customer's, whichever matches
+    better. Without a search index, matches are listed newest first.
+    """
+    if not tokens(term):
+        return []
+    vendor = connections[using].vendor
+    table = model._meta.db_table
+    scored = scored_sql(table, term, vendor)
+    if scored is None:
+        queryset = filter_queryset(model.objects.using(using), term).order_by('-id')
+        return list(queryset.values_list('id', flat=True)[offset:offset + limit])
+
+    sql, params = scored
+    if model is Order:
+        customer_sql, customer_params = scored_sql(Customer._meta.db_table, term, vendor)
+        sql = (
+            f'SELECT id, MAX(score) AS score FROM ({sql} UNION ALL '
+            f'SELECT orders.id AS id, customer_matches.score AS score FROM ({customer_sql}) AS customer_matches '
+            f'JOIN orders ON orders.customer_id = customer_matches.id) AS matches GROUP BY id'
+        )
+        params = params + customer_params
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM ({sql}) AS ranked ORDER BY score DESC, id DESC LIMIT %s OFFSET %s',
+            params + [limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,10 +1,24 @@
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Customer, Order
-import phonenumbers
-from phonenumbers.phonenumberutil import NumberParseException
+from .models import Customer, CustomerOrderStats, Order
 from rest_framework.exceptions import ValidationError
+from .metrics import timed
+from .services.phone import InvalidPhoneNumber, normalize_phone
 
-class CustomerSerializer(serializers.ModelSerializer):
+
+class TimedSerializerMixin:
+    """Counts validation and output rendering towards the request's ``serializer`` timing."""
+
+    def is_valid(self, *args, **kwargs):
+        with timed('serializer'):
+            return super().is_valid(*args, **kwargs)
+
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+class CustomerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = ['id', 'name', 'code', 'email', 'phone', 'location', 'joined_at']
@@ -14,39 +28,118 @@ class CustomerSerializer(serializers.ModelSerializer):
         }
 
     def validate_phone(self, value):
+        # Store the canonical E.164 form (e.g. +254712345678) so sending never has to re-parse it
         try:
-            # Parse the phone number using the phonenumbers library
-            phone_number = phonenumbers.parse(value)
+            return normalize_phone(value)
+        except InvalidPhoneNumber as e:
+            raise serializers.ValidationError(str(e))
 
-            # Check if the number is valid
-            if not phonenumbers.is_valid_number(phone_number):
-                raise serializers.ValidationError("Phone number is not valid.")
 
-            # Format the phone number in E.164 format (e.g., +254712345678 or +1XXX5551234)
-            formatted_phone = phonenumbers.format_number(phone_number, phonenumbers.PhoneNumberFormat.E164)
-            return formatted_phone
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    total_cost = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
 
-        except NumberParseException:
-            raise serializers.ValidationError("Phone number must be a valid international number.")
-        except Exception as e:
-            raise serializers.ValidationError(str(e))
+    class Meta:
+        model = Order
+        fields = ['id', 'customer', 'item', 'quantity', 'amount', 'total_cost', 'payment_method', 'created_at']
+        read_only_fields = ['created_at']
+        extra_kwargs = {
+            # The related field already loads the customer; just word the miss the way the API always has
+            'customer': {'error_messages': {'does_not_exist': 'Customer with ID {pk_value} does not exist.'}},
+        }
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class CustomerOrderStatsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CustomerOrderStats
+        fields = ['customer', 'order_count', 'total_spent', 'last_order_at']
+
+
+class PreloadedCustomerField(serializers.PrimaryKeyRelatedField):
+    """Resolves the customer from ``context['customers']`` instead of querying per item."""
+
+    def to_internal_value(self, data):
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        customer = self.context['customers'].get(pk)
+        if customer is None:
+            raise ValidationError(f'Customer with ID {data} does not exist.')
+        return customer
+
+
+class BulkOrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    customer = PreloadedCustomerField(queryset=Customer.objects.all())
+    total_cost = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
     class Meta:
         model = Order
-        fields = ['id', 'customer', 'item', 'quantity', 'amount', 'payment_method', 'created_at']
+        fields = ['id', 'customer', 'item', 'quantity', 'amount', 'total_cost', 'payment_method', 'created_at']
         read_only_fields = ['created_at']
 
-    def to_internal_value(self, data):
-        validated_data = super().to_internal_value(data)
 
-        # Check if customer exists
-        customer_id = data.get('customer')
-        if customer_id:
-            try:
-                Customer.objects.get(pk=customer_id)
-            except Customer.DoesNotExist:
-                raise ValidationError({'customer': f'Customer with ID {customer_id} does not exist.'})
+def format_datetime(value):
+    """Render an aware datetime exactly like DRF's ``DateTimeField``."""
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _column_formatter(field):
+    if isinstance(field, models.GeneratedField):
+        field = field.output_field
+    if isinstance(field, models.DecimalField):
+        return f'{{:.{field.decimal_places}f}}'.format
+    if isinstance(field, models.DateTimeField):
+        return format_datetime
+    return None
+
+
+class RowSerializer:
+    """
+    Read-only fast path for large responses.
+
+    Serializes ``values()`` rows instead of model instances, with each column's
+    formatter resolved once per class, and produces the same output as
+    ``serializer_class`` without DRF's per-field machinery.
+    """
+    serializer_class = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = cls.serializer_class.Meta
+        cls.columns = []
+        for name in meta.fields:
+            field = meta.model._meta.get_field(name)
+            cls.columns.append((name, field.attname, _column_formatter(field)))
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*[key for _, key, _ in cls.columns])
+
+    @classmethod
+    def to_representation(cls, row):
+        data = {}
+        for name, key, formatter in cls.columns:
+            value = row[key]
+            data[name] = value if formatter is None or value is None else formatter(value)
+        return data
+
+    @property
+    def data(self):
+        to_representation = self.to_representation
+        with timed('serializer'):
+            return [to_representation(row) for row in self.rows]
+
+
+class CustomerRowSerializer(RowSerializer):
+    serializer_class = CustomerSerializer
+
 
-        return validated_data
\ No newline at end of file
+class OrderRowSerializer(RowSerializer):
+    serializer_class = OrderSerializer
@@ -0,0 +1,188 @@
+import heapq
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from api.models import Order
+from api.serializers import format_datetime
+
+PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+GROUPINGS = {'payment_method': 'payment_method', 'location': 'customer__location'}
+
+# Range reported when the request gives no ``created_after``
+DEFAULT_SPANS = {'day': timedelta(days=30), 'week': timedelta(weeks=12), 'month': timedelta(days=365)}
+
+GENERATION_KEY = 'api:analytics:generation'
+
+
+def bucket_start(value, period):
+    """Start of the ``period`` bucket holding ``value``, in the current time zone."""
+    local = timezone.localtime(value).replace(tzinfo=None)
+    start = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        start -= timedelta(days=start.weekday())
+    elif period == 'month':
+        start = start.replace(day=1)
+    return timezone.make_aware(start)
+
+
+def next_bucket(start, period):
+    local = timezone.localtime(start).replace(tzinfo=None)
+    if period == 'day':
+        local += timedelta(days=1)
+    elif period == 'week':
+        local += timedelta(weeks=1)
+    else:
+        local = local.replace(year=local.year + local.month // 12, month=local.month % 12 + 1)
+    return timezone.make_aware(local)
+
+
+def bucket_starts(period, created_after, created_before):
+    """Starts of every bucket overlapping ``[created_after, created_before)``."""
+    starts = []
+    start = bucket_start(created_after, period)
+    while start < created_before:
+        starts.append(start)
+        start = next_bucket(start, period)
+    return starts
+
+
+def _generation():
+    # Clock-based, so a generation recreated after eviction is newer than any before it
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _bucket_key(period, start, generation):
+    # API_CACHE_VERSION is bumped whenever a serializer's output changes
+    return f'api:analytics:{period}:{start.isoformat()}:g{generation}:v{settings.API_CACHE_VERSION}'
+
+
+def invalidate_order_buckets(created_at):
+    """
+    Drop the cached buckets holding an order created at ``created_at``, now
+    and again once the surrounding transaction commits.
+    """
+    generation = _generation()
+    keys = [_bucket_key(period, bucket_start(created_at, period), generation) for period in PERIODS]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_analytics():
+    """Retire every cached bucket, e.g. after a customer's location changed."""
+    _bump_generation()
+    transaction.on_commit(_bump_generation)
+
+
+def _empty_bucket():
+    return {'orders': 0, 'revenue': Decimal('0.00'), 'groups': {name: {} for name in GROUPINGS}, 'top_items': []}
+
+
+def _compute(period, created_after, created_before):
+    """Aggregate ``[created_after, created_before)`` per bucket in the database."""
+    revenue = Sum('total_cost')
+    orders = Order.objects.filter(
+        created_at__gte=created_after, created_at__lt=created_before,
+    ).order_by().annotate(bucket=PERIODS[period]('created_at'))
+    buckets = {}
+
+    for name, field in GROUPINGS.items():
+        rows = orders.values('bucket', field).annotate(orders=Count('id'), revenue=revenue)
+        for row in rows:
+            bucket = buckets.setdefault(bucket_start(row['bucket'], period), _empty_bucket())
+            bucket['groups'][name][row[field]] = (row['orders'], row['revenue'])
+            if name == 'payment_method':
+                bucket['orders'] += row['orders']
+                bucket['revenue'] += row['revenue']
+
+    items = {}
+    rows = orders.values('bucket', 'item').annotate(orders=Count('id'), units=Sum('quantity'), revenue=revenue)
+    for row in rows:
+        items.setdefault(bucket_start(row['bucket'], period), []).append(
+            (row['item'], row['orders'], row['units'], row['revenue'])
+        )
+    for start, rows in items.items():
+        top_items = heapq.nlargest(settings.ANALYTICS_TOP_ITEMS, rows, key=lambda row: row[3])
+        buckets.setdefault(start, _empty_bucket())['top_items'] = top_items
+    return buckets
+
+
+def sales_buckets(period, created_after, created_before):
+    """
+    Per-bucket order counts, revenue, breakdowns and top items.
+
+    Raises ``ValueError`` when the range spans more than ``ANALYTICS_MAX_BUCKETS``.
+
+    Closed buckets (ended before now) come from the cache once computed; the
+    rest, normally just the open bucket, are aggregated in one pass over the
+    smallest date range covering them. Returns ``[(start, end, closed, bucket)]``.
+    """
+    now = timezone.now()
+    starts = bucket_starts(period, created_after, min(created_before, now))
+    if len(starts) > settings.ANALYTICS_MAX_BUCKETS:
+        raise ValueError(f"The range spans more than {settings.ANALYTICS_MAX_BUCKETS} {period} buckets.")
+    ends = {start: next_bucket(start, period) for start in starts}
+    generation = _generation()
+    keys = {start: _bucket_key(period, start, generation) for start in starts}
+
+    cached = cache.get_many([keys[start] for start in starts if ends[start] <= now])
+    buckets = {start: cached[keys[start]] for start in starts if keys[start] in cached}
+    missing = [start for start in starts if start not in buckets]
+    if missing:
+        computed = _compute(period, missing[0], ends[missing[-1]])
+        for start in missing:
+            buckets[start] = computed.get(start) or _empty_bucket()
+        closed = {keys[start]: buckets[start] for start in missing if ends[start] <= now}
+        if closed:
+            cache.set_many(closed, settings.ANALYTICS_CACHE_TIMEOUT)
+    return [(start, ends[start], ends[start] <= now, buckets[start]) for start in starts]
+
+
+def _money(value):
+    return f'{value:.2f}'
+
+
+def sales_report(period, group_by, created_after=None, created_before=None, top_items=None):
+    """
+    Sales per ``period`` bucket between ``created_after`` and ``created_before``,
+    broken down by ``group_by`` (a key of ``GROUPINGS``).
+
+    Buckets are reported whole, so the range is widened to bucket boundaries.
+    """
+    created_before = created_before or timezone.now()
+    created_after = created_after or created_before - DEFAULT_SPANS[period]
+    top_items = settings.ANALYTICS_TOP_ITEMS if top_items is None else min(top_items, settings.ANALYTICS_TOP_ITEMS)
+
+    buckets = []
+    for start, end, closed, bucket in sales_buckets(period, created_after, created_before):
+        groups = sorted(bucket['groups'][group_by].items(), key=lambda group: group[1][1], reverse=True)
+        buckets.append({
+            'start': format_datetime(start),
+            'end': format_datetime(end),
+            'closed': closed,
+            'orders': bucket['orders'],
+            'revenue': _money(bucket['revenue']),
+            'groups': [
+                {'key': key, 'orders': orders, 'revenue': _money(revenue)}
+                for key, (orders, revenue) in groups
+            ],
+            'top_items': [
+                {'item': item, 'orders': orders, 'quantity': quantity, 'revenue': _money(revenue)}
+                for item, orders, quantity, revenue in bucket['top_items'][:top_items]
+            ],
+        })
+    return {'period': period, 'group_by': group_by, 'buckets': buckets}
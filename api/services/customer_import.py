@@ -0,0 +1,119 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+
+from api.cache import invalidate_details
+from api.services.analytics import invalidate_analytics
+from api.models import Customer
+from api.services.phone import InvalidPhoneNumber, normalize_phone
+
+REQUIRED_COLUMNS = {'name', 'code', 'phone'}
+UPDATE_FIELDS = ['name', 'email', 'phone', 'location']
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def reject(self, line, code, error):
+        self.rejected.append({'line': line, 'code': code, 'error': error})
+
+    @property
+    def rows(self):
+        return self.imported + len(self.rejected)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+
+def _clean(row):
+    name = (row.get('name') or '').strip()
+    code = (row.get('code') or '').strip()
+    email = (row.get('email') or '').strip() or None
+    location = (row.get('location') or '').strip() or None
+
+    if not name or len(name) > 100:
+        raise ValueError("Name is required and must be at most 100 characters.")
+    if not 3 <= len(code) <= 20:
+        raise ValueError("Code must be between 3 and 20 characters.")
+    if location and len(location) > 100:
+        raise ValueError("Location must be at most 100 characters.")
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValueError("Enter a valid email address.")
+    try:
+        phone = normalize_phone(row.get('phone') or '')
+    except InvalidPhoneNumber as e:
+        raise ValueError(str(e))
+
+    return Customer(name=name, code=code, email=email, phone=phone, location=location)
+
+
+def _upsert(customers):
+    options = {'update_conflicts': True, 'update_fields': UPDATE_FIELDS}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['code']
+    with transaction.atomic():
+        existing = {
+            code: (pk, location)
+            for pk, code, location in Customer.objects.filter(
+                code__in=[customer.code for customer in customers],
+            ).values_list('id', 'code', 'location')
+        }
+        Customer.objects.bulk_create(customers, **options)
+        # Upserts bypass the signals that evict cached customer payloads; new
+        # customers have nothing cached yet
+        invalidate_details('customer', [pk for pk, _ in existing.values()])
+        # ...and a changed location moves a customer's orders to another group
+        if any(customer.code in existing and existing[customer.code][1] != customer.location
+               for customer in customers):
+            invalidate_analytics()
+
+
+def import_customers(rows, chunk_size=None):
+    """
+    Validate and upsert customers from an iterable of CSV row dicts.
+
+    Rows are consumed lazily and written in ``chunk_size`` batches keyed on
+    ``Customer.code``; existing customers are updated in place. Repeated codes
+    within the input keep the first row and reject the rest. Returns an
+    ``ImportResult`` with counts and row-level rejects (line numbers assume a
+    header on line 1).
+    """
+    chunk_size = chunk_size or settings.CUSTOMER_IMPORT_CHUNK_SIZE
+    result = ImportResult()
+    seen = set()
+    chunk = []
+
+    for line, row in enumerate(rows, start=2):
+        try:
+            customer = _clean(row)
+        except ValueError as e:
+            result.reject(line, row.get('code'), str(e))
+            continue
+        if customer.code in seen:
+            result.reject(line, customer.code, "Duplicate code in file.")
+            continue
+        seen.add(customer.code)
+
+        chunk.append(customer)
+        if len(chunk) >= chunk_size:
+            _upsert(chunk)
+            result.imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        _upsert(chunk)
+        result.imported += len(chunk)
+
+    result.elapsed = time.monotonic() - result.started
+    return result
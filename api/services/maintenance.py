@@ -0,0 +1,28 @@
+import time
+
+
+def delete_in_batches(queryset, batch_size=5000, pause=0, log=None, label='rows', before_delete=None):
+    """
+    Delete the rows of ``queryset`` ``batch_size`` at a time; returns how many were deleted.
+
+    Each batch is a short delete by primary key, so a large backlog does not
+    hold locks on a busy table; ``pause`` seconds between batches leaves room
+    for other writers. ``before_delete(ids)`` runs ahead of each batch, e.g.
+    to remove dependent rows without the cascade collector's extra queries.
+    ``log`` receives a running total described by ``label``.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        if before_delete:
+            before_delete(ids)
+        model.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if log:
+            log(f"Pruned {deleted} {label}")
+        if pause:
+            time.sleep(pause)
+    return deleted
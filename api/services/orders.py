@@ -0,0 +1,38 @@
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Max
+
+from api.models import Order
+
+
+def insert_orders(orders, batch_size=500):
+    """
+    Insert ``orders`` with multi-row INSERTs and set their ids and totals.
+
+    Backends that cannot return rows from a bulk insert (MySQL) get them read
+    back in one query: the new rows are those above the highest id visible
+    before inserting, matched to ``orders`` on their column values. Rows that
+    are identical in every column are interchangeable, so any pairing is
+    correct. Call it inside a transaction.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Order.objects.bulk_create(orders, batch_size=batch_size)
+
+    fields = ('customer_id', 'item', 'quantity', 'amount', 'payment_method', 'created_at')
+    last_id = Order.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    Order.objects.bulk_create(orders, batch_size=batch_size)
+    pending = defaultdict(list)
+    for order in orders:
+        pending[tuple(getattr(order, field) for field in fields)].append(order)
+    rows = Order.objects.filter(
+        id__gt=last_id, customer_id__in={order.customer_id for order in orders},
+    ).order_by('id').values_list('id', 'total_cost', *fields)
+    for row_id, total_cost, *values in rows:
+        matches = pending.get(tuple(values))
+        if matches:
+            order = matches.pop()
+            order.pk, order.total_cost = row_id, total_cost
+    if any(pending.values()):
+        raise RuntimeError("Could not read back the ids of bulk-inserted orders.")
+    return orders
@@ -0,0 +1,109 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import SMSOutbox
+from api.services.sms import SMSBatcher
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_sms(phone, message):
+    """
+    Queue an SMS for background delivery.
+
+    Call this inside the same transaction as the write that triggered the
+    notification so the message is only delivered if that write commits.
+    """
+    return SMSOutbox.objects.create(phone=phone, message=message)
+
+
+def enqueue_many(messages):
+    """Queue many ``(phone, message)`` pairs with a single bulk insert."""
+    return SMSOutbox.objects.bulk_create(
+        [SMSOutbox(phone=phone, message=message) for phone, message in messages],
+        batch_size=500,
+    )
+
+
+def _backoff(attempts):
+    delay = settings.SMS_OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.SMS_OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+def _claim_batch(batch_size, queryset=None):
+    """
+    Lease up to ``batch_size`` due messages, from ``queryset`` if given, to this worker.
+
+    Claimed rows have their next attempt pushed out by the lease period, so a
+    worker that dies mid-batch only delays delivery instead of losing it, and
+    concurrent workers never pick up the same rows.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = (SMSOutbox.objects.all() if queryset is None else queryset).filter(
+            status=SMSOutbox.STATUS_PENDING,
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        if batch:
+            SMSOutbox.objects.filter(pk__in=[entry.pk for entry in batch]).update(
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + timedelta(seconds=settings.SMS_OUTBOX_LEASE_SECONDS),
+            )
+            for entry in batch:
+                entry.attempts += 1
+    return batch
+
+
+def _mark_sent(entry):
+    SMSOutbox.objects.filter(pk=entry.pk).update(
+        status=SMSOutbox.STATUS_SENT,
+        sent_at=timezone.now(),
+        last_error='',
+    )
+
+
+def _mark_failed(entry, error):
+    if entry.attempts >= settings.SMS_OUTBOX_MAX_ATTEMPTS:
+        logger.error(f"Giving up on SMS #{entry.pk} after {entry.attempts} attempts: {error}")
+        SMSOutbox.objects.filter(pk=entry.pk).update(status=SMSOutbox.STATUS_FAILED, last_error=error)
+        return
+    SMSOutbox.objects.filter(pk=entry.pk).update(
+        next_attempt_at=timezone.now() + _backoff(entry.attempts),
+        last_error=error,
+    )
+
+
+def dispatch_pending(batch_size=None, gateway=None, queryset=None):
+    """
+    Deliver one batch of due outbox messages.
+
+    Entries sharing the same text are sent as a single multi-recipient call.
+    ``gateway`` is any callable taking ``(message, recipients)`` and returning a
+    dict of recipient to success; it defaults to ``SMSService.send_bulk``.
+    ``queryset`` limits delivery to those outbox entries. Returns a
+    ``(sent, failed)`` tuple for the batch.
+    """
+    batch = _claim_batch(batch_size or settings.SMS_OUTBOX_BATCH_SIZE, queryset)
+    if not batch:
+        return 0, 0
+
+    with SMSBatcher(sender=gateway, flush_size=len(batch)) as batcher:
+        queued = [(entry, batcher.add(entry.phone, entry.message)) for entry in batch]
+
+    sent = failed = 0
+    for entry, pending in queued:
+        if pending.delivered:
+            _mark_sent(entry)
+            sent += 1
+        else:
+            _mark_failed(entry, pending.error)
+            failed += 1
+    return sent, failed
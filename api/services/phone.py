@@ -0,0 +1,81 @@
+import functools
+import re
+
+from django.conf import settings
+
+# Customers are stored in this form, so the send path can skip parsing them
+E164_PATTERN = re.compile(r'^\+[1-9]\d{6,14}$')
+
+
+class InvalidPhoneNumber(ValueError):
+    pass
+
+
+@functools.lru_cache(maxsize=settings.PHONE_CACHE_SIZE)
+def _normalize(value, region):
+    # Returns (e164, error) so invalid inputs are memoized too. phonenumbers is
+    # imported here because the models import this module and its metadata is
+    # slow to load on every process start.
+    import phonenumbers
+    from phonenumbers.phonenumberutil import NumberParseException
+
+    try:
+        number = phonenumbers.parse(value, region)
+    except NumberParseException:
+        return None, "Phone number must be a valid international number."
+    if not phonenumbers.is_valid_number(number):
+        return None, "Phone number is not valid."
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164), None
+
+
+def normalize_phone(value, region=None):
+    """Return ``value`` in E.164 format, or raise ``InvalidPhoneNumber``."""
+    phone, error = _normalize(value.strip(), region)
+    if error:
+        raise InvalidPhoneNumber(error)
+    return phone
+
+
+def sms_recipient(value):
+    """
+    Return the E.164 number to send an SMS to, or ``None`` if it is invalid.
+
+    Stored customer phones are already canonical and pass straight through.
+    Anything else (rows saved before normalization, local formats such as
+    ``0712345678``) is parsed in ``PHONE_DEFAULT_REGION``.
+    """
+    if E164_PATTERN.match(value):
+        return value
+    try:
+        return normalize_phone(value, settings.PHONE_DEFAULT_REGION)
+    except InvalidPhoneNumber:
+        return None
+
+
+def international_digits(partial):
+    """
+    Digits of a partial phone number as they appear in the stored E.164 form.
+
+    A national trunk prefix (``0722 000`` in Kenya) is swapped for the
+    ``PHONE_DEFAULT_REGION`` country code, so searches typed the local way
+    still prefix-match stored numbers.
+    """
+    import phonenumbers
+
+    digits = re.sub(r'\D', '', partial)
+    if partial.lstrip().startswith('+') or not digits.startswith('0'):
+        return digits
+    return f'{phonenumbers.country_code_for_region(settings.PHONE_DEFAULT_REGION)}{digits[1:]}'
+
+
+def cache_stats():
+    """Hit/miss counters for this process's normalization cache."""
+    info = _normalize.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'hit_rate': round(info.hits / lookups, 4) if lookups else None,
+    }
@@ -1,47 +1,86 @@
-import africastalking
-import os
 import logging
+import time
+from django.conf import settings
+
+from api.metrics import timed
+from api.services.sms_backends import get_sms_backend
 
 logger = logging.getLogger(__name__)
 
 class SMSService:
     @classmethod
     def send_order_notification(cls, customer_phone, message):
-        try:
-            username = os.getenv('AFRICASTALKING_USERNAME')
-            api_key = os.getenv('AFRICASTALKING_API_KEY')
-
-            africastalking.initialize(username, api_key)
-            sms = africastalking.SMS
-
-            formatted_phone = cls._format_phone_number(customer_phone)
-            logger.debug(f"Formatted phone: {formatted_phone}")
-
-            if not formatted_phone:
-                logger.warning("Invalid phone number format.")
-                return False
-
-            response = sms.send(message, [formatted_phone])
-            logger.debug(f"AT Response: {response}")
-
-            recipients = response.get('SMSMessageData', {}).get('Recipients', [])
-            return recipients and recipients[0].get('status') == 'Success'
-
-        except Exception as e:
-            logger.error(f"SMS Error: {e}", exc_info=True)
-            return False
-
-    @staticmethod
-    def _format_phone_number(phone):
-        cleaned = ''.join(filter(str.isdigit, phone))
-        if cleaned.startswith('0') and len(cleaned) == 10:
-            return f'+254{cleaned[1:]}'
-        elif cleaned.startswith('254') and len(cleaned) == 12:
-            return f'+{cleaned}'
-        elif cleaned.startswith('254') and len(cleaned) == 13:
-            return f'+{cleaned}'
-        elif cleaned.startswith('7') and len(cleaned) == 9:
-            return f'+254{cleaned}'
-        elif cleaned.startswith('+254'):
-            return cleaned
-        return None
+        return cls.send_bulk(message, [customer_phone]).get(customer_phone, False)
+
+    @classmethod
+    def send_bulk(cls, message, recipients):
+        """
+        Send one message to many recipients through the configured ``SMS_BACKEND``.
+
+        Returns a dict mapping each phone number, as passed in, to whether the
+        backend accepted it.
+        """
+        with timed('sms'):
+            return get_sms_backend().send_bulk(message, recipients)
+
+
+class PendingSMS:
+    """Handle for a message queued on an ``SMSBatcher``; filled in on flush."""
+
+    def __init__(self, phone, message):
+        self.phone = phone
+        self.message = message
+        self.delivered = None
+        self.error = ''
+
+
+class SMSBatcher:
+    """
+    Collects messages and sends identical texts as multi-recipient calls.
+
+    Messages are flushed once ``flush_size`` are pending or the oldest has
+    waited ``flush_interval`` seconds (checked on ``add``), and on ``flush()``
+    or leaving the ``with`` block. ``sender`` defaults to
+    ``SMSService.send_bulk`` and receives ``(message, recipients)``.
+    """
+
+    def __init__(self, sender=None, flush_size=None, flush_interval=None):
+        self.sender = sender or SMSService.send_bulk
+        self.flush_size = flush_size or settings.SMS_BATCH_FLUSH_SIZE
+        self.flush_interval = settings.SMS_BATCH_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._groups = {}
+        self._pending = 0
+        self._oldest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def add(self, phone, message):
+        pending = PendingSMS(phone, message)
+        self._groups.setdefault(message, []).append(pending)
+        self._pending += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+        if self._pending >= self.flush_size or time.monotonic() - self._oldest >= self.flush_interval:
+            self.flush()
+        return pending
+
+    def flush(self):
+        groups, self._groups = self._groups, {}
+        self._pending, self._oldest = 0, None
+
+        for message, queued in groups.items():
+            try:
+                statuses = self.sender(message, [pending.phone for pending in queued])
+                error = ''
+            except Exception as e:
+                logger.error(f"SMS batch error: {e}", exc_info=True)
+                statuses, error = {}, str(e)
+
+            for pending in queued:
+                pending.delivered = bool(statuses.get(pending.phone))
+                pending.error = error or ('' if pending.delivered else 'Gateway rejected the message.')
@@ -0,0 +1,129 @@
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from api.services.phone import sms_recipient
+from api.services.sms_gateway import CircuitOpenError, GatewayError, get_sms_client
+
+logger = logging.getLogger(__name__)
+
+# Messages captured by LocMemBackend, like django.core.mail.outbox
+outbox = []
+
+
+class BaseSMSBackend:
+    """
+    Base class for ``SMS_BACKEND`` implementations.
+
+    ``send_bulk`` normalizes the recipients and maps results back to the
+    numbers as passed in; subclasses only implement ``send_messages``, which
+    receives E.164 numbers and returns a dict of number to success.
+    """
+
+    def send_bulk(self, message, recipients):
+        results = {phone: False for phone in recipients}
+
+        formatted = {}
+        for phone in recipients:
+            formatted_phone = sms_recipient(phone)
+            if formatted_phone:
+                formatted.setdefault(formatted_phone, []).append(phone)
+            else:
+                logger.warning(f"Invalid phone number format: {phone}")
+        if not formatted:
+            return results
+
+        for number, accepted in self.send_messages(message, list(formatted)).items():
+            for phone in formatted.get(number, []):
+                results[phone] = accepted
+        return results
+
+    def send_messages(self, message, numbers):
+        raise NotImplementedError('subclasses of BaseSMSBackend must override send_messages()')
+
+
+class AfricasTalkingBackend(BaseSMSBackend):
+    """Delivers through the Africa's Talking gateway in ``SMS_MAX_RECIPIENTS_PER_REQUEST`` chunks."""
+
+    def send_messages(self, message, numbers):
+        results = {}
+        try:
+            client = get_sms_client()
+        except ImproperlyConfigured as e:
+            logger.error(f"SMS Error: {e}")
+            return results
+
+        chunk_size = settings.SMS_MAX_RECIPIENTS_PER_REQUEST
+        for start in range(0, len(numbers), chunk_size):
+            chunk = numbers[start:start + chunk_size]
+            try:
+                response = client.send(message, chunk)
+                logger.debug(f"AT Response: {response}")
+            except CircuitOpenError as e:
+                # The remaining chunks would be refused too; leave them for the retry
+                logger.warning(f"SMS Error: {e}")
+                break
+            except GatewayError as e:
+                logger.error(f"SMS Error: {e}")
+                continue
+
+            for recipient in response.get('SMSMessageData', {}).get('Recipients', []):
+                results[recipient.get('number')] = recipient.get('status') == 'Success'
+        return results
+
+
+class LocMemBackend(BaseSMSBackend):
+    """Accepts every message and records it in ``outbox`` for tests and benchmarks."""
+
+    def send_messages(self, message, numbers):
+        outbox.append({'message': message, 'to': numbers})
+        return dict.fromkeys(numbers, True)
+
+
+class FileBackend(BaseSMSBackend):
+    """Appends each send as a JSON line to ``SMS_FILE_PATH``."""
+
+    def __init__(self, path=None):
+        self.path = path or settings.SMS_FILE_PATH
+        self._lock = threading.Lock()
+
+    def send_messages(self, message, numbers):
+        line = json.dumps({'sent_at': timezone.now().isoformat(), 'to': numbers, 'message': message})
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(line + '\n')
+        return dict.fromkeys(numbers, True)
+
+
+class DummyBackend(BaseSMSBackend):
+    """Accepts and discards every message."""
+
+    def send_messages(self, message, numbers):
+        return dict.fromkeys(numbers, True)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_sms_backend():
+    """Return this process's instance of the configured ``SMS_BACKEND``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.SMS_BACKEND)()
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    global _backend
+    if setting in ('SMS_BACKEND', 'SMS_FILE_PATH'):
+        _backend = None
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PRODUCTION_URL = 'https://api.africastalking.com/version1'
+SANDBOX_URL = 'https://api.sandbox.africastalking.com/version1'
+
+
+class GatewayError(Exception):
+    pass
+
+
+class CircuitOpenError(GatewayError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after ``failure_threshold`` consecutive gateway failures.
+
+    Once open, calls are refused for ``reset_timeout`` seconds. The first call
+    after that is let through as a trial: success closes the circuit again,
+    failure re-opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("SMS gateway circuit is open; failing fast.")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"SMS gateway circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class AfricasTalkingClient:
+    """
+    Minimal Africa's Talking SMS client over one pooled, keep-alive session.
+
+    The SDK posts through module-level ``requests.post`` and so opens a new
+    TLS connection per message; this keeps connections open across sends
+    and bounds every call with ``timeout``.
+    """
+
+    def __init__(self, username, api_key, base_url=None, timeout=(3.05, 10), pool_size=10,
+                 failure_threshold=5, reset_timeout=30):
+        self.username = username
+        self.base_url = (base_url or (SANDBOX_URL if username == 'sandbox' else PRODUCTION_URL)).rstrip('/')
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/json', 'apiKey': api_key})
+
+    def send(self, message, recipients):
+        """POST one message to ``recipients`` and return the decoded JSON response."""
+        self.breaker.before_call()
+        try:
+            response = self.session.post(
+                f'{self.base_url}/messaging',
+                data={'username': self.username, 'to': ','.join(recipients), 'message': message, 'bulkSMSMode': 1},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise GatewayError(str(e)) from e
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise GatewayError(f"Gateway returned {response.status_code}: {response.text[:200]}")
+        # A 4xx is a problem with this request, not a sign the gateway is down
+        self.breaker.record_success()
+        if response.status_code >= 400:
+            raise GatewayError(f"Gateway returned {response.status_code}: {response.text[:200]}")
+        try:
+            return response.json()
+        except ValueError:
+            raise GatewayError(f"Gateway returned a non-JSON response: {response.text[:200]}")
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sms_client():
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not settings.AFRICASTALKING_USERNAME or not settings.AFRICASTALKING_API_KEY:
+                    raise ImproperlyConfigured("AFRICASTALKING_USERNAME and AFRICASTALKING_API_KEY must be set.")
+                _client = AfricasTalkingClient(
+                    settings.AFRICASTALKING_USERNAME,
+                    settings.AFRICASTALKING_API_KEY,
+                    base_url=settings.AFRICASTALKING_API_URL or None,
+                    timeout=(settings.SMS_CONNECT_TIMEOUT, settings.SMS_READ_TIMEOUT),
+                    pool_size=settings.SMS_POOL_SIZE,
+                    failure_threshold=settings.SMS_CIRCUIT_FAILURE_THRESHOLD,
+                    reset_timeout=settings.SMS_CIRCUIT_RESET_SECONDS,
+                )
+    return _client
+
+
+def reset_sms_client():
+    """Drop the shared client so the next send builds one from current settings."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith(('AFRICASTALKING_', 'SMS_CONNECT_', 'SMS_READ_', 'SMS_POOL_', 'SMS_CIRCUIT_')):
+        reset_sms_client()
@@ -0,0 +1,110 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+
+from api.models import CustomerOrderStats, Order
+
+STATS_FIELDS = ('customer_id', 'quantity', 'amount', 'created_at')
+
+
+def _total(quantity, amount):
+    # Unsaved instances may still hold the int/float/str the caller assigned
+    return int(quantity) * Order._meta.get_field('amount').to_python(amount)
+
+
+def _apply(customer_id, count, spent, last_order_at=None, removed_order_at=None):
+    """
+    Adjust one customer's rollup with a single UPDATE.
+
+    ``last_order_at`` moves forward when a newer order is added. When the
+    removed order was the latest one, it is recomputed from the remaining
+    orders inside the same statement.
+    """
+    updates = {
+        'order_count': F('order_count') + count,
+        'total_spent': F('total_spent') + spent,
+    }
+    if last_order_at is not None:
+        updates['last_order_at'] = Case(
+            When(Q(last_order_at__isnull=True) | Q(last_order_at__lt=last_order_at), then=Value(last_order_at)),
+            default=F('last_order_at'),
+        )
+    elif removed_order_at is not None:
+        latest = Order.objects.filter(customer_id=OuterRef('customer_id')).order_by('-created_at').values('created_at')[:1]
+        updates['last_order_at'] = Case(
+            When(last_order_at=removed_order_at, then=Subquery(latest)),
+            default=F('last_order_at'),
+        )
+
+    if CustomerOrderStats.objects.filter(customer_id=customer_id).update(**updates):
+        return
+
+    # Customers inserted without signals (e.g. bulk imports) have no row yet
+    if count < 0:
+        rebuild_customer_stats([customer_id])
+        return
+    try:
+        with transaction.atomic():
+            CustomerOrderStats.objects.create(
+                customer_id=customer_id, order_count=count, total_spent=spent, last_order_at=last_order_at
+            )
+    except IntegrityError:
+        CustomerOrderStats.objects.filter(customer_id=customer_id).update(**updates)
+
+
+def record_orders_created(orders):
+    """Fold newly inserted orders into the rollups, one UPDATE per customer."""
+    totals = defaultdict(lambda: [0, Decimal('0.00'), None])
+    for order in orders:
+        entry = totals[order.customer_id]
+        entry[0] += 1
+        entry[1] += _total(order.quantity, order.amount)
+        if entry[2] is None or order.created_at > entry[2]:
+            entry[2] = order.created_at
+    for customer_id, (count, spent, last_order_at) in totals.items():
+        _apply(customer_id, count, spent, last_order_at=last_order_at)
+
+
+def record_order_changed(order, previous):
+    """Apply an update given the previously stored ``STATS_FIELDS`` values."""
+    old_total = _total(previous['quantity'], previous['amount'])
+    new_total = _total(order.quantity, order.amount)
+    if previous['customer_id'] != order.customer_id:
+        _apply(previous['customer_id'], -1, -old_total, removed_order_at=previous['created_at'])
+        _apply(order.customer_id, 1, new_total, last_order_at=order.created_at)
+    elif new_total != old_total:
+        _apply(order.customer_id, 0, new_total - old_total)
+
+
+def record_order_deleted(order):
+    _apply(order.customer_id, -1, -_total(order.quantity, order.amount), removed_order_at=order.created_at)
+
+
+def rebuild_customer_stats(customer_ids=None, batch_size=1000):
+    """Recompute rollups from the orders table (all customers, or just ``customer_ids``)."""
+    orders = Order.objects.all()
+    stats = CustomerOrderStats.objects.all()
+    if customer_ids is not None:
+        orders = orders.filter(customer_id__in=customer_ids)
+        stats = stats.filter(customer_id__in=customer_ids)
+
+    rows = orders.order_by().values('customer_id').annotate(
+        order_count=Count('id'),
+        total_spent=Sum('total_cost'),
+        last_order_at=Max('created_at'),
+    )
+    rebuilt = 0
+    with transaction.atomic():
+        stats.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(CustomerOrderStats(**row))
+            if len(batch) >= batch_size:
+                CustomerOrderStats.objects.bulk_create(batch)
+                rebuilt += len(batch)
+                batch = []
+        CustomerOrderStats.objects.bulk_create(batch)
+        rebuilt += len(batch)
+    return rebuilt
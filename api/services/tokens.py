@@ -0,0 +1,47 @@
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from api.models import RevokedAccessToken
+from api.services.maintenance import delete_in_batches
+
+
+def blacklist_user_tokens(user):
+    """
+    Blacklist every unexpired outstanding token of ``user`` with one bulk insert.
+
+    Tokens that are already blacklisted are skipped up front, and
+    ``ignore_conflicts`` covers a concurrent logout inserting the same rows.
+    Returns the number of tokens newly blacklisted.
+    """
+    pending = OutstandingToken.objects.filter(
+        user=user,
+        expires_at__gt=timezone.now(),
+        blacklistedtoken__isnull=True,
+    ).order_by().values_list('id', flat=True)
+    created = BlacklistedToken.objects.bulk_create(
+        [BlacklistedToken(token_id=token_id) for token_id in pending],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def prune_expired_tokens(batch_size=5000, pause=0, log=None):
+    """
+    Delete expired outstanding tokens, and their blacklist rows, ``batch_size``
+    at a time, then expired revoked access tokens.
+
+    An expired token fails signature validation on its own, so none of these
+    rows are needed any more. Returns the number of tokens deleted.
+    """
+    cutoff = timezone.now()
+    deleted = delete_in_batches(
+        OutstandingToken.objects.filter(expires_at__lte=cutoff), batch_size, pause, log,
+        label='expired outstanding tokens',
+        before_delete=lambda ids: BlacklistedToken.objects.filter(token_id__in=ids).delete(),
+    )
+    deleted += delete_in_batches(
+        RevokedAccessToken.objects.filter(expires_at__lte=cutoff), batch_size, pause, log,
+        label='expired revoked access tokens',
+    )
+    return deleted
@@ -0,0 +1,69 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.cache import invalidate_details
+from api.models import Customer, CustomerOrderStats, Order
+from api.services import stats
+from api.services.analytics import invalidate_analytics, invalidate_order_buckets
+
+
+def _snapshot(order):
+    return {field: getattr(order, field) for field in stats.STATS_FIELDS}
+
+
+_UNKNOWN = object()
+
+
+def _location_changed(instance, update_fields):
+    if update_fields is not None and 'location' not in update_fields:
+        return False
+    previous = getattr(instance, '_loaded_values', {})
+    # Not loaded from the database, or loaded without it: assume it changed
+    return previous.get('location', _UNKNOWN) != instance.location
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    invalidate_details('customer', [instance.pk])
+    # Start every customer with an empty rollup so order writes are a single UPDATE
+    if created and not raw:
+        CustomerOrderStats.objects.create(customer=instance)
+    elif not created and _location_changed(instance, update_fields):
+        # A location change regroups every bucket holding this customer's orders
+        invalidate_analytics()
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), 'location': instance.location}
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    invalidate_details('order', [instance.pk])
+    if raw:
+        return
+    if created:
+        stats.record_orders_created([instance])
+    else:
+        # New orders land in the open bucket, which is never cached
+        invalidate_order_buckets(instance.created_at)
+        previous = getattr(instance, '_loaded_values', {})
+        if all(field in previous for field in stats.STATS_FIELDS):
+            stats.record_order_changed(instance, previous)
+        else:
+            # Loaded with deferred fields, so the old values are unknown
+            stats.rebuild_customer_stats([instance.customer_id])
+    instance._loaded_values = _snapshot(instance)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, origin=None, **kwargs):
+    invalidate_details('order', [instance.pk])
+    # Stats rows cascade away with their customer, nothing to adjust
+    if isinstance(origin, Customer) or getattr(origin, 'model', None) is Customer:
+        return
+    stats.record_order_deleted(instance)
+    invalidate_order_buckets(instance.created_at)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    invalidate_details('customer', [instance.pk])
+    invalidate_analytics()
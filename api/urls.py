@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     CustomerViewSet,
     OrderViewSet,
@@ -16,6 +17,10 @@ router.register(r'orders', OrderViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('api/', include(router.urls)),
+    path('async/customers/', async_views.CustomerListCreateView.as_view(), name='async-customer-list'),
+    path('async/customers/<int:pk>/', async_views.CustomerDetailView.as_view(), name='async-customer-detail'),
+    path('async/orders/', async_views.OrderListCreateView.as_view(), name='async-order-list'),
+    path('async/orders/<int:pk>/', async_views.OrderDetailView.as_view(), name='async-order-detail'),
     path('oidc/login/', CustomLoginView.as_view(), name='oidc-login'),
     path('oidc/logout/', logout_view, name='oidc_logout'),
     path('oidc/callback/', CustomOIDCAuthenticationCallbackView.as_view(), name='oidc_authentication_callback'),
@@ -2,21 +2,47 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.utils.urls import replace_query_param
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, timezone as dt_timezone
 from django.urls import reverse
 from mozilla_django_oidc.views import OIDCAuthenticationRequestView, OIDCAuthenticationCallbackView
 from django.contrib.auth import logout as django_logout
 from django.shortcuts import redirect
 from django.conf import settings
 from urllib.parse import urlencode
-from .models import Customer, Order
-from .serializers import CustomerSerializer, OrderSerializer
-from .services.sms import SMSService
+from . import search
+from .models import Customer, CustomerOrderStats, Order
+from .serializers import (
+    BulkOrderSerializer,
+    CustomerOrderStatsSerializer,
+    CustomerRowSerializer,
+    CustomerSerializer,
+    OrderRowSerializer,
+    OrderSerializer,
+)
+from .services.orders import insert_orders
+from .services.outbox import enqueue_many, enqueue_sms
+from .services.analytics import GROUPINGS, PERIODS, sales_report
+from .services.stats import record_orders_created
+from .services.tokens import blacklist_user_tokens
+from .services.customer_import import REQUIRED_COLUMNS, import_customers
+from .authentication import JWTAuthentication, revoke_access_token
+from .metrics import render_metrics
+from .idempotency import idempotent
+from .cache import cache_detail, detail_response, get_cached_detail
+from .pagination import parse_decimal
+from .exports import EXPORT_CONTENT_TYPES, order_rows, stream_csv, stream_ndjson
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+import codecs
+import csv
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,13 +84,18 @@ def logout_view(request):
     # Log out of Django
     user = request.user
     if user.is_authenticated:
-        # Blacklist all refresh tokens for this user
-        tokens = OutstandingToken.objects.filter(user=user)
-        for token in tokens:
-            try:
-                BlacklistedToken.objects.get_or_create(token=token)
-            except Exception:
-                continue
+        # Blacklist all of this user's refresh tokens in one set-based insert
+        blacklist_user_tokens(user)
+
+    # The bearer access token, if any, would otherwise keep working until it expires
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    try:
+        raw_token = authenticator.get_raw_token(header) if header else None
+    except AuthenticationFailed:
+        raw_token = None
+    if raw_token:
+        revoke_access_token(raw_token, user=user if user.is_authenticated else None)
 
     django_logout(request)
 
@@ -77,24 +108,80 @@ def logout_view(request):
     return redirect(logout_url)
 
 
+def metrics_view(request):
+    # Prometheus scrape endpoint. Per-view traffic and latency are not public:
+    # scrapers present METRICS_TOKEN, or without one must be local or staff
+    if settings.METRICS_TOKEN:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}')
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS or request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RankedSearchMixin:
+    """
+    ``GET .../search/?q=<term>``: rows matching ``term`` through the search
+    index, best match first, ``page_size`` per ``?page=``. Paging stops at
+    ``SEARCH_MAX_RESULTS`` matches; clients refine the term instead.
+    """
+    search_row_serializer = None
+    search_envelope = None
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        term = request.query_params.get('q', '')
+        if not search.tokens(term):
+            return Response({'error': 'q must contain at least one letter or digit.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = int(request.query_params.get('page', 1))
+        except ValueError:
+            page = 0
+        if page < 1:
+            return Response({'error': 'page must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = self.paginator.get_page_size(request)
+        offset = (page - 1) * page_size
+        if offset >= settings.SEARCH_MAX_RESULTS:
+            return Response({'error': f'Only the first {settings.SEARCH_MAX_RESULTS} matches can be paged; refine the search.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.search_row_serializer.serializer_class.Meta.model
+        limit = min(page_size + 1, settings.SEARCH_MAX_RESULTS - offset)
+        ids = search.ranked_ids(model, term, limit=limit, offset=offset)
+        has_next = len(ids) > page_size
+        ids = ids[:page_size]
+
+        rows = {row['id']: row for row in self.search_row_serializer.values(model.objects.filter(id__in=ids))}
+        data = self.search_row_serializer([rows[pk] for pk in ids if pk in rows]).data
+        next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1) if has_next else None
+        return Response({self.search_envelope: data, 'next': next_link}, status=status.HTTP_200_OK)
+
+
 # ViewSet for Customers
-class CustomerViewSet(viewsets.ModelViewSet):
-    queryset = Customer.objects.all()
+class CustomerViewSet(RankedSearchMixin, viewsets.ModelViewSet):
+    queryset = Customer.objects.only(*CustomerSerializer.Meta.fields)
     serializer_class = CustomerSerializer
+    keyset_field = 'joined_at'
+    search_row_serializer = CustomerRowSerializer
+    search_envelope = 'customers'
 
     def list(self, request, *args, **kwargs):
-        customers = self.get_queryset()
-        serializer = self.get_serializer(customers, many=True)
-        return Response({'customers': serializer.data}, status=status.HTTP_200_OK)
+        # Read-only fast path: values() rows skip model and ModelSerializer overhead
+        customers = self.paginate_queryset(CustomerRowSerializer.values(self.get_queryset()))
+        serializer = CustomerRowSerializer(customers)
+        return Response({'customers': serializer.data, 'next': self.paginator.get_next_link()}, status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
         try:
-            customer = self.get_object()
-            serializer = self.get_serializer(customer)
-            return Response({'customer': serializer.data}, status=status.HTTP_200_OK)
+            entry = get_cached_detail('customer', kwargs['pk'])
+            if entry is None:
+                customer = self.get_object()
+                entry = cache_detail('customer', customer.pk, self.get_serializer(customer).data)
+            return detail_response(request, 'customer', entry)
         except Customer.DoesNotExist:
             return Response({'error': 'Customer not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+    @idempotent('customers.create')
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -120,40 +207,183 @@ class CustomerViewSet(viewsets.ModelViewSet):
         except Customer.DoesNotExist:
             return Response({'error': 'Customer not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return Response({'error': 'Customer not found.'}, status=status.HTTP_404_NOT_FOUND)
+        stats = CustomerOrderStats.objects.filter(customer_id=pk).first()
+        if stats is None:
+            if not Customer.objects.filter(pk=pk).exists():
+                return Response({'error': 'Customer not found.'}, status=status.HTTP_404_NOT_FOUND)
+            stats = CustomerOrderStats(customer_id=pk)
+        return Response({'stats': CustomerOrderStatsSerializer(stats).data}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_csv(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV file in the "file" field.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Decode line by line so large files are never held in memory as text
+        reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+        try:
+            missing = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+        except UnicodeDecodeError:
+            return Response({'error': 'The file must be UTF-8 encoded CSV.'}, status=status.HTTP_400_BAD_REQUEST)
+        if missing:
+            return Response({'error': f"Missing required columns: {', '.join(sorted(missing))}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = import_customers(reader)
+        except UnicodeDecodeError:
+            return Response({'error': 'The file must be UTF-8 encoded CSV.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'message': f'Imported {result.imported} customers.',
+            'imported': result.imported,
+            'rejected_count': len(result.rejected),
+            'rejected': result.rejected[:100],
+            'rows_per_second': result.rows_per_second,
+        }, status=status.HTTP_200_OK)
+
 # ViewSet for Orders
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(RankedSearchMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    search_row_serializer = OrderRowSerializer
+    search_envelope = 'orders'
+    keyset_field = 'created_at'
+    # ?ordering= values for the list, each paged newest/largest first
+    keyset_orderings = {'-created_at': 'created_at', '-total_cost': 'total_cost'}
 
     def get_queryset(self):
+        queryset = Order.objects.only(*OrderSerializer.Meta.fields)
+        if self.action in ('update', 'partial_update', 'destroy'):
+            # The SMS notification needs the customer's name and phone
+            queryset = queryset.select_related('customer').only(
+                *OrderSerializer.Meta.fields, 'customer__name', 'customer__phone'
+            )
+
         customer_id = self.request.query_params.get('customer_id')
         if customer_id:
-            return Order.objects.filter(customer_id=customer_id)
-        return Order.objects.all()
+            queryset = queryset.filter(customer_id=customer_id)
+
+        created_after = self.parse_date_param('created_after')
+        if created_after:
+            queryset = queryset.filter(created_at__gte=created_after)
+        created_before = self.parse_date_param('created_before')
+        if created_before:
+            queryset = queryset.filter(created_at__lt=created_before)
+
+        min_total = self.parse_decimal_param('min_total')
+        if min_total is not None:
+            queryset = queryset.filter(total_cost__gte=min_total)
+        max_total = self.parse_decimal_param('max_total')
+        if max_total is not None:
+            queryset = queryset.filter(total_cost__lte=max_total)
+        return queryset
+
+    def parse_decimal_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_decimal(value)
+        except ArithmeticError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({'error': f"{name} must be a number."})
+        return parsed
+
+    def parse_date_param(self, name):
+        # Accepts a date (midnight UTC) or a full ISO 8601 datetime
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                parsed_date = parse_date(value)
+                if parsed_date is not None:
+                    parsed = datetime.combine(parsed_date, datetime.min.time())
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({'error': f"{name} must be an ISO 8601 date or datetime."})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response({'error': f"export_format must be one of: {', '.join(EXPORT_CONTENT_TYPES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = order_rows(self.get_queryset())
+        stream = stream_csv(rows) if export_format == 'csv' else stream_ndjson(rows)
+        response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        period = request.query_params.get('period', 'day')
+        if period not in PERIODS:
+            return Response({'error': f"period must be one of: {', '.join(PERIODS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        group_by = request.query_params.get('group_by', 'payment_method')
+        if group_by not in GROUPINGS:
+            return Response({'error': f"group_by must be one of: {', '.join(GROUPINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top_items = int(request.query_params.get('top_items', settings.ANALYTICS_TOP_ITEMS))
+        except ValueError:
+            top_items = -1
+        if top_items < 0:
+            return Response({'error': 'top_items must be a non-negative integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = sales_report(
+                period, group_by,
+                created_after=self.parse_date_param('created_after'),
+                created_before=self.parse_date_param('created_before'),
+                top_items=top_items,
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
 
     def list(self, request, *args, **kwargs):
-        orders = self.get_queryset()
-        serializer = self.get_serializer(orders, many=True)
-        return Response({'orders': serializer.data}, status=status.HTTP_200_OK)
+        ordering = request.query_params.get('ordering', '-created_at')
+        if ordering not in self.keyset_orderings:
+            return Response({'error': f"ordering must be one of: {', '.join(self.keyset_orderings)}."}, status=status.HTTP_400_BAD_REQUEST)
+        self.keyset_field = self.keyset_orderings[ordering]
+        orders = self.paginate_queryset(OrderRowSerializer.values(self.get_queryset()))
+        serializer = OrderRowSerializer(orders)
+        return Response({'orders': serializer.data, 'next': self.paginator.get_next_link()}, status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
         try:
-            order = self.get_object()
-            serializer = self.get_serializer(order)
-            return Response({'order': serializer.data}, status=status.HTTP_200_OK)
+            # Filtered lookups (?customer_id=...) must still 404 on a mismatch, so skip the cache
+            entry = None if request.query_params else get_cached_detail('order', kwargs['pk'])
+            if entry is None:
+                order = self.get_object()
+                entry = cache_detail('order', order.pk, self.get_serializer(order).data)
+            return detail_response(request, 'order', entry)
         except Order.DoesNotExist:
             return Response({'error': 'Order not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+    @idempotent('orders.create')
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
 
         if not serializer.is_valid():
             error_detail = serializer.errors
-            customer_id = request.data.get('customer')
+            customer_errors = error_detail.get('customer', [])
 
-            if 'customer' in error_detail and customer_id:
-                if not Customer.objects.filter(pk=customer_id).exists():
-                    return Response({'error': f"Customer with ID {customer_id} does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+            if customer_errors and customer_errors[0].code == 'does_not_exist':
+                return Response({'error': str(customer_errors[0])}, status=status.HTTP_400_BAD_REQUEST)
 
             return Response({'error': error_detail}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -165,8 +395,9 @@ class OrderViewSet(viewsets.ModelViewSet):
             instance = self.get_object()
             serializer = self.get_serializer(instance, data=request.data)
             if serializer.is_valid():
-                self.perform_update(serializer)
-                self.send_sms(instance, action="updated")
+                with transaction.atomic():
+                    self.perform_update(serializer)
+                    self.send_sms(instance, action="updated")
                 return Response({'message': 'Order updated successfully.', 'order': serializer.data}, status=status.HTTP_200_OK)
             return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         except Order.DoesNotExist:
@@ -175,27 +406,73 @@ class OrderViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
-            customer = instance.customer
-            order_id = instance.id
-            item = instance.item
-            self.perform_destroy(instance)
-
-            message = (
-                f"Dear {customer.name},\n"
-                f"Your order (#{order_id}) for {item} has been successfully cancelled."
-            )
-            SMSService.send_order_notification(customer.phone, message)
+            phone = instance.customer.phone
+            message = self.build_sms_message(instance, "cancelled")
+            with transaction.atomic():
+                self.perform_destroy(instance)
+                enqueue_sms(phone, message)
             return Response({'message': 'Order deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
         except Order.DoesNotExist:
             return Response({'error': 'Order not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        items = request.data.get('orders') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty list of orders.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.ORDER_BULK_MAX_ITEMS:
+            return Response({'error': f'A bulk request may contain at most {settings.ORDER_BULK_MAX_ITEMS} orders.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Resolve every referenced customer with one IN query
+        customer_ids = set()
+        for item in items:
+            if isinstance(item, dict):
+                try:
+                    customer_ids.add(int(item.get('customer')))
+                except (TypeError, ValueError):
+                    continue
+        customers = Customer.objects.in_bulk(customer_ids)
+
+        orders, errors = [], []
+        for index, item in enumerate(items):
+            serializer = BulkOrderSerializer(data=item, context={'customers': customers})
+            if serializer.is_valid():
+                orders.append(Order(**serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        if errors:
+            return Response({'error': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            insert_orders(orders)
+            # bulk_create skips post_save, so fold the rows into the rollups here
+            record_orders_created(orders)
+            enqueue_many(
+                (order.customer.phone, self.build_sms_message(order, "created")) for order in orders
+            )
+
+        data = BulkOrderSerializer(orders, many=True).data
+        return Response({'message': f'{len(orders)} orders created successfully.', 'orders': data}, status=status.HTTP_201_CREATED)
+
     def perform_create(self, serializer):
-        order = serializer.save()
-        self.send_sms(order, action="created")
+        with transaction.atomic():
+            order = serializer.save()
+            self.send_sms(order, action="created")
 
     def send_sms(self, order, action):
+        message = self.build_sms_message(order, action)
+        if message is None:
+            return
+
+        # Delivery happens in the outbox worker (manage.py send_sms_outbox), so the
+        # SMS is only sent if the surrounding order transaction commits.
+        enqueue_sms(order.customer.phone, message)
+        logger.debug(f"SMS queued for Order #{order.id}")
+
+    @staticmethod
+    def build_sms_message(order, action):
         customer = order.customer
-        total_cost = order.amount * order.quantity
+        total_cost = order.total_cost
 
         if action == "created":
             message = (
@@ -212,8 +489,11 @@ class OrderViewSet(viewsets.ModelViewSet):
                 f"New Total: KES {total_cost:.2f}\n"
                 f"Payment Method: {order.payment_method}"
             )
+        elif action == "cancelled":
+            message = (
+                f"Dear {customer.name},\n"
+                f"Your order (#{order.id}) for {order.item} has been successfully cancelled."
+            )
         else:
-            return
-
-        success = SMSService.send_order_notification(customer.phone, message)
-        print(f"SMS {'sent' if success else 'failed'} for Order #{order.id}")
\ No newline at end of file
+            return None
+        return message
@@ -1,7 +1,6 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import africastalking
 from datetime import timedelta
 
 load_dotenv()
@@ -30,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,20 +88,110 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
         #'rest_framework.permissions.AllowAny',  # Allow unauthenticated requests
     ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
 
+# Cache: Redis when REDIS_URL is set, otherwise per-process memory
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Cached customer/order detail payloads (bump the version when serializer output changes)
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 300))
+API_CACHE_VERSION = 2
+
 # Africa's Talking Configuration
-africastalking.initialize(
-    username=os.getenv('AFRICASTALKING_USERNAME'),
-    api_key=os.getenv('AFRICASTALKING_API_KEY')
-)
+AFRICASTALKING_USERNAME = os.getenv('AFRICASTALKING_USERNAME')
+AFRICASTALKING_API_KEY = os.getenv('AFRICASTALKING_API_KEY')
+# Override the gateway base URL (e.g. a local stub); defaults to sandbox/production by username
+AFRICASTALKING_API_URL = os.getenv('AFRICASTALKING_API_URL', '')
+
+# SMS gateway HTTP client: timeouts in seconds, pooled keep-alive connections,
+# and the circuit breaker that fails fast while the gateway is down
+SMS_CONNECT_TIMEOUT = float(os.getenv('SMS_CONNECT_TIMEOUT', 3.05))
+SMS_READ_TIMEOUT = float(os.getenv('SMS_READ_TIMEOUT', 10))
+SMS_POOL_SIZE = int(os.getenv('SMS_POOL_SIZE', 10))
+SMS_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('SMS_CIRCUIT_FAILURE_THRESHOLD', 5))
+SMS_CIRCUIT_RESET_SECONDS = float(os.getenv('SMS_CIRCUIT_RESET_SECONDS', 30))
+
+# Swagger/ReDoc: set API_DOCS_ENABLED=False to drop the routes in production; the
+# generated schema is cached for API_DOCS_CACHE_TIMEOUT seconds
+API_DOCS_ENABLED = os.getenv('API_DOCS_ENABLED', 'True') == 'True'
+API_DOCS_CACHE_TIMEOUT = int(os.getenv('API_DOCS_CACHE_TIMEOUT', 3600))
+
+# Per-request instrumentation: fraction of requests timed (Server-Timing header and
+# /metrics histograms), whether /metrics is served, and the bearer token it requires.
+# Without a token only staff users and METRICS_ALLOWED_IPS (comma-separated, empty by
+# default: behind a local reverse proxy every request comes from 127.0.0.1) may read it.
+PERF_SAMPLE_RATE = float(os.getenv('PERF_SAMPLE_RATE', 1.0))
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
+# Maximum number of orders accepted by POST /api/orders/bulk/
+ORDER_BULK_MAX_ITEMS = int(os.getenv('ORDER_BULK_MAX_ITEMS', 5000))
+
+# Sales analytics (GET /api/orders/analytics/): closed buckets stay cached for
+# ANALYTICS_CACHE_TIMEOUT seconds unless an order in them changes
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 30 * 24 * 3600))
+ANALYTICS_MAX_BUCKETS = int(os.getenv('ANALYTICS_MAX_BUCKETS', 366))
+ANALYTICS_TOP_ITEMS = int(os.getenv('ANALYTICS_TOP_ITEMS', 10))
+
+# Admin changelists over unfiltered tables at least this large show an estimated count
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000))
+
+# GET .../search/ pages through at most this many ranked matches
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', 1000))
+
+# Idempotency-Key on POST /api/orders/ and /api/customers/: responses are replayed for
+# IDEMPOTENCY_KEY_TTL seconds; an unfinished request holds its key for
+# IDEMPOTENCY_LOCK_TIMEOUT seconds before a retry may take it over
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# Rows upserted per batch by the customer CSV import (command and endpoint)
+CUSTOMER_IMPORT_CHUNK_SIZE = int(os.getenv('CUSTOMER_IMPORT_CHUNK_SIZE', 1000))
+
+# SMS delivery backend (dotted path): AfricasTalkingBackend, LocMemBackend (in-memory
+# capture), FileBackend (JSON lines at SMS_FILE_PATH) or DummyBackend, all in api.services.sms_backends
+SMS_BACKEND = os.getenv('SMS_BACKEND', 'api.services.sms_backends.AfricasTalkingBackend')
+SMS_FILE_PATH = os.getenv('SMS_FILE_PATH', str(BASE_DIR / 'sms_messages.log'))
+
+# SMS batching: recipients per gateway call and SMSBatcher flush thresholds
+SMS_MAX_RECIPIENTS_PER_REQUEST = int(os.getenv('SMS_MAX_RECIPIENTS_PER_REQUEST', 1000))
+SMS_BATCH_FLUSH_SIZE = int(os.getenv('SMS_BATCH_FLUSH_SIZE', 1000))
+SMS_BATCH_FLUSH_INTERVAL = float(os.getenv('SMS_BATCH_FLUSH_INTERVAL', 1.0))
+
+# Phone normalization: region assumed for numbers without a country code on the
+# SMS path, and how many normalized inputs each process memoizes
+PHONE_DEFAULT_REGION = os.getenv('PHONE_DEFAULT_REGION', 'KE')
+PHONE_CACHE_SIZE = int(os.getenv('PHONE_CACHE_SIZE', 10000))
+
+# SMS outbox worker (python manage.py send_sms_outbox)
+SMS_OUTBOX_BATCH_SIZE = int(os.getenv('SMS_OUTBOX_BATCH_SIZE', 100))
+SMS_OUTBOX_MAX_ATTEMPTS = int(os.getenv('SMS_OUTBOX_MAX_ATTEMPTS', 5))
+SMS_OUTBOX_BACKOFF_SECONDS = int(os.getenv('SMS_OUTBOX_BACKOFF_SECONDS', 30))
+SMS_OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv('SMS_OUTBOX_MAX_BACKOFF_SECONDS', 3600))
+SMS_OUTBOX_LEASE_SECONDS = int(os.getenv('SMS_OUTBOX_LEASE_SECONDS', 300))
+SMS_OUTBOX_POLL_INTERVAL = float(os.getenv('SMS_OUTBOX_POLL_INTERVAL', 2))
 
 # OIDC Configuration
 OIDC_AUDIENCE = os.getenv('OIDC_AUDIENCE')
@@ -151,6 +241,12 @@ SIMPLE_JWT.update({
     'ROTATE_REFRESH_TOKENS': True,
 })
 
+# JWT_STATELESS_AUTH builds request.user from the token claims instead of loading the
+# User row on every request. Revoked access token IDs are held in memory and new
+# revocations are read every JWT_REVOCATION_REFRESH_SECONDS.
+JWT_STATELESS_AUTH = os.getenv('JWT_STATELESS_AUTH', 'False') == 'True'
+JWT_REVOCATION_REFRESH_SECONDS = int(os.getenv('JWT_REVOCATION_REFRESH_SECONDS', 30))
+
 # Session management
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'  # Better for OIDC flow
 SESSION_COOKIE_NAME = 'customers_orders_sessionid'
@@ -1,25 +1,53 @@
+from functools import cache
+
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
-
-# Swagger Schema View
-schema_view = get_schema_view(
-   openapi.Info(
-      title="API Documentation",
-      default_version='v1',
-      description="API documentation for the Customer Service API",
-      contact=openapi.Contact(email="dimatata01@gmail.com"),
-      license=openapi.License(name="Derick Ingairo"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,), 
-)
+
+from api.views import metrics_view
+
+
+@cache
+def docs_view(renderer):
+    # drf_yasg is imported and the schema view built on the first docs request,
+    # not at startup; the rendered schema is then cached for API_DOCS_CACHE_TIMEOUT
+    from drf_yasg.views import get_schema_view
+    from drf_yasg import openapi
+    from rest_framework import permissions
+
+    # Swagger Schema View
+    schema_view = get_schema_view(
+       openapi.Info(
+          title="API Documentation",
+          default_version='v1',
+          description="API documentation for the Customer Service API",
+          contact=openapi.Contact(email="dimatata01@gmail.com"),
+          license=openapi.License(name="Derick Ingairo"),
+       ),
+       public=True,
+       permission_classes=(permissions.AllowAny,),
+    )
+    return schema_view.with_ui(renderer, cache_timeout=settings.API_DOCS_CACHE_TIMEOUT)
+
+
+def swagger_ui(request, *args, **kwargs):
+    return docs_view('swagger')(request, *args, **kwargs)
+
+
+def redoc_ui(request, *args, **kwargs):
+    return docs_view('redoc')(request, *args, **kwargs)
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),  #app's URLs
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),  # Swagger UI
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),  # ReDoc UI
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path('metrics', metrics_view, name='metrics'))
+
+if settings.API_DOCS_ENABLED:
+    urlpatterns += [
+        path('swagger/', swagger_ui, name='schema-swagger-ui'),  # Swagger UI
+        path('redoc/', redoc_ui, name='schema-redoc'),  # ReDoc UI
+    ]